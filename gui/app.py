@@ -9,6 +9,7 @@ import os
 import threading
 import time
 import glob
+import shutil
 import ctypes
 import json
 import logging
@@ -38,10 +39,13 @@ except ImportError:
     MICA_AVAILABLE = False
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from modules.downloader import VideoDownloader
-from modules.processor import VideoProcessor
+from modules.downloader import VideoDownloader, DownloadManager, describe_format
+from modules.processor import VideoProcessor, ProgressEvent
+from modules.encoder_profile import parts_per_minute
+from modules.supervisor import SUPERVISOR
 from modules.uploader import TikTokUploader
 from modules.database import HistoryManager
+from modules.fingerprint import Fingerprinter, FINGERPRINT_SECONDS
 from modules.state_manager import StateManager
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -75,12 +79,21 @@ def wipe_temp():
                 try: os.remove(f)
                 except: pass
     
+    # Sources keep whatever container they arrived in (mp4, webm, mkv, ...)
     main_dl = os.path.join(os.path.dirname(__file__), '..', 'downloads')
-    for f in glob.glob(os.path.join(main_dl, "*.mp4")):
-         if os.path.getmtime(f) < now - (12 * 3600):
+    for f in glob.glob(os.path.join(main_dl, "*")):
+         if os.path.isfile(f) and os.path.getmtime(f) < now - (12 * 3600):
               try: os.remove(f)
               except: pass
 
+    # Half-written parts from a crash or kill (finished parts are renamed)
+    processed = os.path.join(os.path.dirname(__file__), '..', 'processed')
+    for f in glob.glob(os.path.join(processed, "*.partial.*")):
+        try: os.remove(f)
+        except: pass
+    for d in glob.glob(os.path.join(processed, ".chunks-*")):
+        shutil.rmtree(d, ignore_errors=True)
+
     sys_temp = os.environ.get('TEMP')
     if sys_temp:
         for pattern in ["ffmpeg-*", "tmp*.mp4", "tmp*.mp3"]:
@@ -1142,6 +1155,7 @@ class Win11HeroCard(QFrame):
 class MainWindow(QMainWindow):
     log_signal = Signal(dict)
     status_signal = Signal(dict)
+    encoder_signal = Signal(str)
     
     def __init__(self):
         super().__init__()
@@ -1183,6 +1197,8 @@ class MainWindow(QMainWindow):
         
         # Initialize modules
         self.downloader = VideoDownloader()
+        # Downloads run ahead of processing, several at once
+        self.downloads = DownloadManager(self.downloader, progress_callback=self._download_progress)
         self.processor = VideoProcessor()
         self.uploader = TikTokUploader()
         self.db = HistoryManager()
@@ -1193,6 +1209,7 @@ class MainWindow(QMainWindow):
         # Connect signals
         self.log_signal.connect(self._log_handler, Qt.QueuedConnection)
         self.status_signal.connect(self._status_handler, Qt.QueuedConnection)
+        self.encoder_signal.connect(self._encoder_handler, Qt.QueuedConnection)
         
         # Build UI
         self._build_ui()
@@ -1423,14 +1440,71 @@ class MainWindow(QMainWindow):
         self.throttle_combo = Win11ComboBox(["0", "5", "10", "15", "30", "60", "120"])
         proc_card.addWidget(Win11SettingsRow("Job Gap", "Minutes between uploads", self.throttle_combo))
         
+        # Parallel parts
+        self.workers_combo = Win11ComboBox(["Auto", "1", "2", "3", "4", "6", "8"])
+        self.workers_combo.setCurrentText("Auto")
+        proc_card.addWidget(Win11SettingsRow("Parallel Parts", "Parts encoded at once", self.workers_combo))
+        
         # Crop toggle
         self.crop_toggle = Win11Toggle(True)
         proc_card.addWidget(Win11SettingsRow("Fit 9:16", "Crop for TikTok vertical", self.crop_toggle))
+        self.smart_crop_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Smart Crop", "Follow the action instead of black bars", self.smart_crop_toggle))
         
         # Speed toggle
         self.speed_toggle = Win11Toggle(False)
         proc_card.addWidget(Win11SettingsRow("1.25x Speed", "Helps evade copyright", self.speed_toggle))
         
+        # Smart cuts toggle
+        self.smart_cuts_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Smart Cuts", "Cut on pauses and scene changes", self.smart_cuts_toggle))
+        
+        # Dead air toggle
+        self.dead_air_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Trim Dead Air", "Cut silent, frozen stretches out of parts", self.dead_air_toggle))
+        
+        # Highlights: only the best N parts of a source
+        self.highlights_combo = Win11ComboBox(["Off", "3", "5", "10"])
+        self.highlights_combo.setCurrentText("Off")
+        proc_card.addWidget(Win11SettingsRow("Highlights", "Only the best parts (loud, talky, busy)", self.highlights_combo))
+        
+        # Size cap per part (MB)
+        self.size_cap_combo = Win11ComboBox(["Off", "25", "50", "100", "250"])
+        self.size_cap_combo.setCurrentText("Off")
+        proc_card.addWidget(Win11SettingsRow("Size Cap (MB)", "Keep every part under the upload limit", self.size_cap_combo))
+        
+        # Loudness toggle
+        self.loudnorm_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Normalize Audio", "Same loudness across all parts", self.loudnorm_toggle))
+        
+        # Single pass toggle
+        self.single_pass_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Single Pass", "Decode once, write all parts", self.single_pass_toggle))
+        
+        # Stream ingest toggle
+        self.stream_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Stream Ingest", "Start cutting while downloading", self.stream_toggle))
+        
+        # Near-duplicate check from a partial download
+        self.dedupe_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Skip Near-Duplicates", "Fingerprint the first minute, skip re-uploads", self.dedupe_toggle))
+        
+        # Extra outputs rendered from the same decode
+        self.variant_toggles = {
+            'hd': Win11Toggle(False),
+            'square': Win11Toggle(False),
+            'preview': Win11Toggle(False),
+        }
+        proc_card.addWidget(Win11SettingsRow("1080p Copy", "Also write 1080x1920", self.variant_toggles['hd']))
+        proc_card.addWidget(Win11SettingsRow("Square Copy", "Also write 1080x1080", self.variant_toggles['square']))
+        proc_card.addWidget(Win11SettingsRow("Preview Copy", "Also write a small low-bitrate copy", self.variant_toggles['preview']))
+        
+        # Cover images from the render pass
+        self.covers_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Covers", "Save a cover image per part", self.covers_toggle))
+        self.sheet_toggle = Win11Toggle(False)
+        proc_card.addWidget(Win11SettingsRow("Contact Sheet", "Tile the covers into one image", self.sheet_toggle))
+        
         left_col.addWidget(proc_card)
         
         # Action buttons
@@ -1610,6 +1684,46 @@ class MainWindow(QMainWindow):
         
         layout.addWidget(advanced_card)
         
+        # Encoder card
+        encoder_card = Win11Card("Encoder")
+        
+        self.encoder_label = QLabel(self._encoder_summary())
+        self.encoder_label.setStyleSheet(f"color: {WinUI.TEXT_SECONDARY}; background: transparent;")
+        encoder_card.addWidget(self.encoder_label)
+        
+        self.calibrate_btn = Win11Button("Calibrate")
+        self.calibrate_btn.clicked.connect(self._calibrate_encoder)
+        encoder_card.addWidget(Win11SettingsRow("Benchmark", "Find the fastest x264 settings for this PC", self.calibrate_btn))
+        
+        layout.addWidget(encoder_card)
+        
+        # Resources card (limits for FFmpeg and other child processes)
+        resources_card = Win11Card("Resources")
+        
+        self.priority_combo = Win11ComboBox(["Below Normal", "Idle", "Normal"])
+        self.priority_combo.changed.connect(self._apply_limits)
+        resources_card.addWidget(Win11SettingsRow("Encoder Priority", "Keep the UI and browser responsive", self.priority_combo))
+        
+        self.free_cores_combo = Win11ComboBox(["0", "1", "2", "4"])
+        self.free_cores_combo.changed.connect(self._apply_limits)
+        resources_card.addWidget(Win11SettingsRow("Free Cores", "CPU cores encoders never use", self.free_cores_combo))
+        
+        self.mem_limit_combo = Win11ComboBox(["None", "1 GB", "2 GB", "4 GB"])
+        self.mem_limit_combo.changed.connect(self._apply_limits)
+        resources_card.addWidget(Win11SettingsRow("Memory Limit", "Per encoder process", self.mem_limit_combo))
+        
+        # Download budget (applies to running downloads too)
+        self.dl_workers_combo = Win11ComboBox(["1", "2", "3", "4"])
+        self.dl_workers_combo.setCurrentText("2")
+        self.dl_workers_combo.changed.connect(self._apply_download_limits)
+        resources_card.addWidget(Win11SettingsRow("Parallel Downloads", "Videos fetched ahead at once", self.dl_workers_combo))
+        
+        self.dl_limit_combo = Win11ComboBox(["Unlimited", "5", "10", "25", "50"])
+        self.dl_limit_combo.changed.connect(self._apply_download_limits)
+        resources_card.addWidget(Win11SettingsRow("Download Limit (MB/s)", "Shared by all downloads", self.dl_limit_combo))
+        
+        layout.addWidget(resources_card)
+        
         layout.addStretch()
         
         scroll.setWidget(content)
@@ -1641,7 +1755,12 @@ class MainWindow(QMainWindow):
         txt = f"{'Date':<20} | {'Status':<10} | {'Title'}\n"
         txt += "─" * 90 + "\n"
         for r in rows:
-            txt += f"{r[2]:<20} | {r[4]:<10} | {r[1]}\n"
+            # r: url, title, date, account, status, file_path, thumbnails
+            covers = ""
+            if r[6]:
+                thumbs = json.loads(r[6])
+                covers = f"  [{sum(1 for c in thumbs['covers'] if c)} covers{', sheet' if thumbs['sheet'] else ''}]"
+            txt += f"{r[2]:<20} | {r[4]:<10} | {r[1]}{covers}\n"
         self.history_output.setText(txt)
     
     def _export_history(self):
@@ -1671,10 +1790,90 @@ class MainWindow(QMainWindow):
         if at_bottom:
             scrollbar.setValue(scrollbar.maximum())
     
+    def _format_progress(self, e):
+        """Render a processor ProgressEvent as a colour-coded log line."""
+        sep = f"<span style='color:{WinUI.TEXT_TERTIARY}'>|</span>"
+        if e.kind == 'part_done':
+            # Part 1 Complete | 100% | 14.6s | Length: 60.0s
+            return (
+                f"<span style='color:{WinUI.TEXT_PRIMARY}'>Part {e.part} Complete</span> {sep} "
+                f"<span style='color:{WinUI.SUCCESS}'>100%</span> {sep} "
+                f"<span style='color:{WinUI.TEXT_PRIMARY}'>{e.elapsed:.1f}s</span> {sep} "
+                f"<span style='color:{WinUI.TEXT_TERTIARY}'>Length: {e.length:.1f}s</span>"
+            )
+        if e.kind == 'part_failed':
+            return f"<span style='color:{WinUI.CRITICAL}'>Part {e.part} Failed</span>"
+        if e.kind == 'aggregate':
+            # Parts 3/12 done | 4 rendering | 41% | ETA: 80s left
+            return (
+                f"<span style='color:{WinUI.TEXT_PRIMARY}'>Parts {e.done}/{e.total} done</span> {sep} "
+                f"<span style='color:{WinUI.TEXT_PRIMARY}'>{e.active} rendering</span> {sep} "
+                f"<span style='color:{WinUI.ACCENT_DEFAULT}'>{e.pct}%</span> {sep} "
+                f"<span style='color:{WinUI.TEXT_TERTIARY}'>ETA: {e.eta}s left</span>"
+            )
+        # Part 1 | 32% | 2.4x | ETA: 12s left
+        return (
+            f"<span style='color:{WinUI.TEXT_PRIMARY}'>Part {e.part}</span> {sep} "
+            f"<span style='color:{WinUI.ACCENT_DEFAULT}'>{e.pct}%</span> {sep} "
+            f"<span style='color:{WinUI.TEXT_TERTIARY}'>{e.speed:.1f}x</span> {sep} "
+            + (f"<span style='color:{WinUI.TEXT_TERTIARY}'>DL {e.downloaded}%</span> {sep} " if e.downloaded >= 0 else "")
+            + f"<span style='color:{WinUI.TEXT_TERTIARY}'>ETA: {e.eta}s left</span>"
+        )
+    
     def _status_handler(self, data):
         self.status_label.setText(data['m'])
         self.hero_card.setStatus(data['m'])
     
+    def _encoder_summary(self):
+        p = self.processor.encoder
+        text = f"Preset: {p['preset']} | CRF: {p['crf']} | Threads: {p['threads'] or 'auto'} | Tune: {p['tune'] or 'none'}"
+        if p.get('realtime'):
+            dur = int(self.duration_combo.currentText()) if hasattr(self, 'duration_combo') else 60
+            text += f"\nMeasured: {p['fps']} fps | ~{parts_per_minute(p, dur):.1f} parts/min at {dur}s parts"
+        else:
+            text += "\nNot calibrated yet"
+        return text
+    
+    def _encoder_handler(self, msg):
+        self.encoder_label.setText(msg or self._encoder_summary())
+        if not msg:
+            self.calibrate_btn.setEnabled(True)
+    
+    def _apply_limits(self, *_):
+        """Push the Resources settings to the process supervisor (affects new children)."""
+        mem = self.mem_limit_combo.currentText()
+        SUPERVISOR.configure(
+            priority=self.priority_combo.currentText().lower().replace(" ", "_"),
+            free_cores=int(self.free_cores_combo.currentText()),
+            memory_mb=None if mem == "None" else int(mem.split()[0]) * 1024,
+        )
+    
+    def _apply_download_limits(self, *_):
+        """Push the download budget to the download manager (takes effect immediately)."""
+        limit = self.dl_limit_combo.currentText()
+        self.downloads.set_concurrency(int(self.dl_workers_combo.currentText()))
+        self.downloads.set_bandwidth(None if limit == "Unlimited" else int(limit) * 2**20)
+    
+    def _download_progress(self, pct, msg):
+        if self.running and msg:
+            self.log_signal.emit({'m': msg, 'c': WinUI.TEXT_TERTIARY, 'u': True})
+    
+    def _calibrate_encoder(self):
+        if self.running:
+            QMessageBox.information(self, "Busy", "Stop the batch before calibrating.")
+            return
+        self.calibrate_btn.setEnabled(False)
+        
+        def work():
+            def progress(pct, msg):
+                self.encoder_signal.emit(f"{msg} ({pct}%)")
+            profile = self.processor.calibrate_encoder(progress_callback=progress)
+            if not profile:
+                self.log_signal.emit({'m': "Calibration failed - check FFmpeg in bin/", 'c': WinUI.CRITICAL, 'u': False})
+            self.encoder_signal.emit("")
+        
+        threading.Thread(target=work, daemon=True).start()
+    
     def _check_recovery(self):
         state = self.state.load_state()
         if state and state.get('active') and state.get('queue'):
@@ -1703,7 +1902,20 @@ class MainWindow(QMainWindow):
         config = {
             'dur': int(self.duration_combo.currentText()),
             'crop': self.crop_toggle.isChecked(),
+            'smart_crop': self.smart_crop_toggle.isChecked(),
             'speed': self.speed_toggle.isChecked(),
+            'single': self.single_pass_toggle.isChecked(),
+            'stream': self.stream_toggle.isChecked(),
+            'dedupe': self.dedupe_toggle.isChecked(),
+            'covers': self.covers_toggle.isChecked(),
+            'sheet': self.sheet_toggle.isChecked(),
+            'variants': [name for name, toggle in self.variant_toggles.items() if toggle.isChecked()],
+            'smart_cuts': self.smart_cuts_toggle.isChecked(),
+            'dead_air': self.dead_air_toggle.isChecked(),
+            'loudnorm': self.loudnorm_toggle.isChecked(),
+            'workers': None if self.workers_combo.currentText() == "Auto" else int(self.workers_combo.currentText()),
+            'highlights': 0 if self.highlights_combo.currentText() == "Off" else int(self.highlights_combo.currentText()),
+            'size_cap': 0 if self.size_cap_combo.currentText() == "Off" else int(self.size_cap_combo.currentText()),
             'user': self.user_input.text(),
             'pwd': self.pwd_input.text(),
             'title': self.title_input.text(),
@@ -1734,11 +1946,36 @@ class MainWindow(QMainWindow):
         self.running = False
         self.paused = False
         self.processor.cancel()
+        self.downloader.cancel()
+        self.downloader.infos.cancel()
+        self.downloads.cancel()
         self.uploader.cancel()
         self.log_signal.emit({'m': "Stopped.", 'c': WinUI.CRITICAL, 'u': False})
     
+    def _fingerprint_source(self, url):
+        """Fingerprint the opening of url from a partial download. Returns (fingerprint, earlier near-duplicate)."""
+        self.status_signal.emit({'m': f"{FluentIcons.DOWNLOAD} Checking for duplicates..."})
+        preview = self.downloader.download_preview(url, FINGERPRINT_SECONDS)
+        if not preview:
+            self.log_signal.emit({'m': f"Duplicate check skipped - {self.downloader.last_error}", 'c': WinUI.TEXT_TERTIARY, 'u': False})
+            return None, None
+        try:
+            fingerprint = Fingerprinter(self.processor).compute(preview)
+        finally:
+            try:
+                os.remove(preview)
+            except OSError:
+                pass
+        if not fingerprint:
+            return None, None
+        return fingerprint, self.db.find_similar(fingerprint)
+    
     def _batch_work(self, config):
         queue = config['queue']
+        # Page info for the whole queue, in the background: downloads reuse it
+        self.downloader.prefetch(queue)
+        # Fetch sources no bigger than the outputs need (streaming has no smart crop)
+        self.downloader.frames = self.processor.output_frames(config['crop'], config['variants'], config['smart_crop'] and not config['stream'])
         
         for i, url in enumerate(queue):
             if not self.running:
@@ -1757,35 +1994,86 @@ class MainWindow(QMainWindow):
             
             self.state.save_state(queue, i)
             self.log_signal.emit({'m': f"─── Processing {i+1}/{len(queue)} ───", 'c': WinUI.TEXT_PRIMARY, 'u': False})
+            seconds, known = self.downloader.queued_duration(queue[i:])
+            if known:
+                self.log_signal.emit({'m': f"Queue: {int(seconds // 3600)}h {int(seconds % 3600 // 60):02d}m of source left ({known}/{len(queue) - i} known)", 'c': WinUI.TEXT_TERTIARY, 'u': False})
             
             try:
                 # Download
                 self.status_signal.emit({'m': f"{FluentIcons.DOWNLOAD} Downloading..."})
                 
                 def progress_callback(pct, msg):
-                    if not self.running:
+                    if not self.running or not msg:
+                        return
+                    if isinstance(msg, ProgressEvent):
+                        self.log_signal.emit({'m': self._format_progress(msg), 'c': WinUI.TEXT_TERTIARY, 'u': True})
                         return
                     self.log_signal.emit({'m': msg, 'c': WinUI.TEXT_TERTIARY, 'u': '%' in msg or 'Part' in msg})
                 
-                filepath = self.downloader.download_video(url, progress_callback=progress_callback)
-                if not filepath:
-                    continue
-                if not os.path.exists(filepath):
-                    base = os.path.splitext(filepath)[0] + ".mp4"
-                    if os.path.exists(base):
-                        filepath = base
+                fingerprint = None
+                if config['dedupe']:
+                    fingerprint, match = self._fingerprint_source(url)
+                    if match:
+                        self.log_signal.emit({'m': f"Skipping near-duplicate of {match['title'] or match['url']} ({match['frames']:.0%} frames match)", 'c': WinUI.CRITICAL, 'u': False})
+                        continue
                 
-                while self.paused and self.running:
-                    self.status_signal.emit({'m': f"{FluentIcons.PAUSE} Paused"})
-                    time.sleep(1)
-                if not self.running:
-                    break
+                if not config['stream']:
+                    # Keep the next few downloads running while this one is processed. With
+                    # dedupe on, a full download only starts once its preview has passed.
+                    ahead = [url] if config['dedupe'] else queue[i:i + self.downloads.concurrency]
+                    for next_url in ahead:
+                        if not self.db.check_exists(next_url):
+                            self.downloads.submit(next_url)
                 
-                # Process
-                self.status_signal.emit({'m': f"{FluentIcons.VIDEO} Processing..."})
-                parts = self.processor.segment_video(filepath, config['dur'], config['crop'], config['speed'], progress_callback=progress_callback)
+                if config['stream']:
+                    # Download and process together: the source is piped straight into FFmpeg
+                    filepath = None
+                    stream = self.downloader.open_stream(url)
+                    if not stream:
+                        self.log_signal.emit({'m': self.downloader.last_error, 'c': WinUI.CRITICAL, 'u': False})
+                        continue
+                    title = self.downloader.last_title
+                    if self.downloader.last_format:
+                        self.log_signal.emit({'m': describe_format(self.downloader.last_format), 'c': WinUI.TEXT_TERTIARY, 'u': False})
+                    self.status_signal.emit({'m': f"{FluentIcons.VIDEO} Streaming..."})
+                    try:
+                        parts = self.processor.segment_stream(stream, config['dur'], config['crop'], config['speed'], progress_callback=progress_callback, variants=config['variants'], covers=config['covers'], contact_sheet=config['sheet'])
+                    finally:
+                        self.downloader.cancel()
+                        self.downloader.stream = None
+                else:
+                    job = self.downloads.submit(url)
+                    while not job.done.wait(0.5) and self.running:
+                        pass
+                    if not self.running:
+                        break
+                    filepath = job.filepath
+                    if not filepath:
+                        self.log_signal.emit({'m': job.error or "Download failed", 'c': WinUI.CRITICAL, 'u': False})
+                        continue
+                    title = job.title
+                    if job.format:
+                        self.log_signal.emit({'m': describe_format(job.format), 'c': WinUI.TEXT_TERTIARY, 'u': False})
+                    
+                    while self.paused and self.running:
+                        self.status_signal.emit({'m': f"{FluentIcons.PAUSE} Paused"})
+                        time.sleep(1)
+                    if not self.running:
+                        break
+                    
+                    # Process
+                    self.status_signal.emit({'m': f"{FluentIcons.VIDEO} Processing..."})
+                    parts = self.processor.segment_video(filepath, config['dur'], config['crop'], config['speed'], progress_callback=progress_callback, single_pass=config['single'], workers=config['workers'], smart_cuts=config['smart_cuts'], variants=config['variants'], covers=config['covers'], contact_sheet=config['sheet'], normalize_audio=config['loudnorm'], smart_crop=config['smart_crop'], highlights=config['highlights'], trim_dead_air=config['dead_air'], max_size_mb=config['size_cap'])
+                for bad in parts.failed:
+                    self.log_signal.emit({'m': f"Part {bad['part']} dropped - {bad['reason']}", 'c': WinUI.CRITICAL, 'u': False})
+                if config['stream'] and self.processor.last_error:
+                    # A short ingest isn't posted or recorded, so the URL is streamed again next run
+                    self.log_signal.emit({'m': f"Not uploading - {self.processor.last_error}", 'c': WinUI.CRITICAL, 'u': False})
+                    continue
                 if not parts:
                     continue
+                for name, paths in parts.variants.items():
+                    self.log_signal.emit({'m': f"{name}: {len(paths)} parts in {self.processor.output_dir}", 'c': WinUI.TEXT_TERTIARY, 'u': False})
                 
                 while self.paused and self.running:
                     self.status_signal.emit({'m': f"{FluentIcons.PAUSE} Paused"})
@@ -1795,7 +2083,7 @@ class MainWindow(QMainWindow):
                 
                 # Upload
                 if config['upload']:
-                    video_title = config['title'] or self.downloader.last_title
+                    video_title = config['title'] or title
                     
                     for j, part in enumerate(parts):
                         if not self.running:
@@ -1817,12 +2105,18 @@ class MainWindow(QMainWindow):
                         
                         if self.uploader.upload_video(part, caption, config['tags'], progress_callback=upload_callback):
                             self.log_signal.emit({'m': f"Uploaded {part_info}", 'c': WinUI.SUCCESS, 'u': False})
+                            self.processor.renders.mark_consumed([part])
                             if config['del']:
                                 os.remove(part)
                 
-                self.db.add_entry(url, self.downloader.last_title, config['user'])
+                thumbnails = None
+                if any(parts.covers) or parts.sheet:
+                    thumbnails = {'covers': parts.covers, 'sheet': parts.sheet}
+                self.db.add_entry(url, title, config['user'], thumbnails=thumbnails)
+                if fingerprint:
+                    self.db.add_fingerprint(url, fingerprint)
                 
-                if config['del'] and os.path.exists(filepath):
+                if config['del'] and filepath and os.path.exists(filepath):
                     os.remove(filepath)
                 
                 # Throttle
@@ -1861,7 +2155,25 @@ class MainWindow(QMainWindow):
             'tags': self.tags_input.text(),
             'dur': self.duration_combo.currentText(),
             'crop': self.crop_toggle.isChecked(),
+            'smart_crop': self.smart_crop_toggle.isChecked(),
             'speed': self.speed_toggle.isChecked(),
+            'single': self.single_pass_toggle.isChecked(),
+            'stream': self.stream_toggle.isChecked(),
+            'dedupe': self.dedupe_toggle.isChecked(),
+            'covers': self.covers_toggle.isChecked(),
+            'sheet': self.sheet_toggle.isChecked(),
+            'variants': [name for name, toggle in self.variant_toggles.items() if toggle.isChecked()],
+            'smart_cuts': self.smart_cuts_toggle.isChecked(),
+            'dead_air': self.dead_air_toggle.isChecked(),
+            'loudnorm': self.loudnorm_toggle.isChecked(),
+            'workers': self.workers_combo.currentText(),
+            'highlights': self.highlights_combo.currentText(),
+            'size_cap': self.size_cap_combo.currentText(),
+            'priority': self.priority_combo.currentText(),
+            'free_cores': self.free_cores_combo.currentText(),
+            'mem_limit': self.mem_limit_combo.currentText(),
+            'dl_workers': self.dl_workers_combo.currentText(),
+            'dl_limit': self.dl_limit_combo.currentText(),
             'user': self.user_input.text(),
             'pwd': self.pwd_input.text(),
             'upload': self.upload_toggle.isChecked(),
@@ -1894,8 +2206,45 @@ class MainWindow(QMainWindow):
                 self.duration_combo.setCurrentText(str(data['dur']))
             if 'crop' in data:
                 self.crop_toggle.setChecked(data['crop'], animate=False)
+            if 'smart_crop' in data:
+                self.smart_crop_toggle.setChecked(data['smart_crop'], animate=False)
             if 'speed' in data:
                 self.speed_toggle.setChecked(data['speed'], animate=False)
+            if 'dedupe' in data:
+                self.dedupe_toggle.setChecked(data['dedupe'], animate=False)
+            if 'single' in data:
+                self.single_pass_toggle.setChecked(data['single'], animate=False)
+            if 'variants' in data:
+                for name, toggle in self.variant_toggles.items():
+                    toggle.setChecked(name in data['variants'], animate=False)
+            if 'covers' in data:
+                self.covers_toggle.setChecked(data['covers'], animate=False)
+            if 'sheet' in data:
+                self.sheet_toggle.setChecked(data['sheet'], animate=False)
+            if 'stream' in data:
+                self.stream_toggle.setChecked(data['stream'], animate=False)
+            if 'loudnorm' in data:
+                self.loudnorm_toggle.setChecked(data['loudnorm'], animate=False)
+            if 'smart_cuts' in data:
+                self.smart_cuts_toggle.setChecked(data['smart_cuts'], animate=False)
+            if 'dead_air' in data:
+                self.dead_air_toggle.setChecked(data['dead_air'], animate=False)
+            if 'workers' in data:
+                self.workers_combo.setCurrentText(str(data['workers']))
+            if 'highlights' in data:
+                self.highlights_combo.setCurrentText(str(data['highlights']))
+            if 'size_cap' in data:
+                self.size_cap_combo.setCurrentText(str(data['size_cap']))
+            if 'priority' in data:
+                self.priority_combo.setCurrentText(data['priority'])
+            if 'free_cores' in data:
+                self.free_cores_combo.setCurrentText(str(data['free_cores']))
+            if 'mem_limit' in data:
+                self.mem_limit_combo.setCurrentText(data['mem_limit'])
+            if 'dl_workers' in data:
+                self.dl_workers_combo.setCurrentText(str(data['dl_workers']))
+            if 'dl_limit' in data:
+                self.dl_limit_combo.setCurrentText(str(data['dl_limit']))
             if 'upload' in data:
                 self.upload_toggle.setChecked(data['upload'], animate=False)
             if 'autodel' in data:
@@ -1904,6 +2253,8 @@ class MainWindow(QMainWindow):
                 self.throttle_combo.setCurrentText(str(data['throttle']))
             if 'browser' in data:
                 self.uploader.set_browser_preference(data['browser'])
+            self._apply_limits()
+            self._apply_download_limits()
         except:
             pass
 
@@ -0,0 +1,318 @@
+"""
+Source analysis - one cheap pass over a source for scene changes, audio level and speech.
+
+A single FrameSampler decode streams tiny grayscale thumbnails at a few
+frames per second, while the same FFmpeg process writes low-rate mono PCM
+to a temp file. Scene scores (mean frame difference) and audio RMS are
+computed with NumPy on a common time grid and cached per source, so
+re-segmenting with a different part duration never re-analyses.
+"""
+
+import os
+import json
+import tempfile
+import subprocess
+
+from modules.sampler import FrameSampler, SceneScorer
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+ANALYSIS_FPS = 4            # Video samples per second (also the grid step: 0.25s)
+FRAME_W, FRAME_H = 64, 36   # Analysis thumbnail size
+AUDIO_RATE = 8000           # Mono PCM rate for level measurement
+SILENCE_DB = -60.0          # Treated as digital silence
+SCENE_CUT = 0.12            # Mean thumbnail difference of a typical hard cut
+VOICE_BAND = (300.0, 3400.0)  # Hz where speech carries most of its energy
+CACHE_KIND = f"cuts:{ANALYSIS_FPS}fps:{FRAME_W}x{FRAME_H}:{AUDIO_RATE}hz:voice"
+
+# Highlight score weights (audio energy, speech density, motion)
+HIGHLIGHT_WEIGHTS = (0.4, 0.3, 0.3)
+SPEECH_RATIO = 0.5          # Voice-band share of a step's energy that counts as speech
+
+# Dead air: stretches trimmed out of parts
+DEAD_AIR_DB = -50.0         # Quieter than this is silent
+FROZEN_SCENE = 0.004        # Mean frame difference below this is a frozen picture
+DEAD_AIR_MIN = 1.5          # Shortest silent + frozen stretch worth trimming (seconds)
+DEAD_AIR_LONG = 5.0         # Silence this long is trimmed even if the picture moves
+DEAD_AIR_PAD = 0.25         # Kept on each side of a trimmed stretch so cuts don't clip words
+
+# Loudness target for every part (EBU R128 style; short-form platforms sit near -14 LUFS)
+LOUDNESS_TARGET = {'I': -14.0, 'TP': -1.5, 'LRA': 11.0}
+LOUDNESS_KIND = "loudnorm:I={I}:TP={TP}:LRA={LRA}".format(**LOUDNESS_TARGET)
+
+
+class SourceAnalyzer:
+    def __init__(self, processor):
+        # Borrow the processor's FFmpeg, cache and cancellable process tracking
+        self.processor = processor
+
+    def analyze(self, path, duration, progress_callback=None):
+        """Return {'step', 'scene', 'rms_db', 'voice'} for path, from the cache when possible."""
+        cached = self.processor.cache.get_analysis(path, CACHE_KIND)
+        if cached:
+            return cached
+        if not NUMPY_AVAILABLE:
+            return None
+
+        data = self._run(path, duration, progress_callback)
+        if data:
+            self.processor.cache.put_analysis(path, CACHE_KIND, data)
+        return data
+
+    def loudness(self, path):
+        """Measure integrated loudness once per source (audio-only decode), cached.
+
+        Returns loudnorm's first-pass measurements, or None for silent or
+        audio-less sources.
+        """
+        cached = self.processor.cache.get_analysis(path, LOUDNESS_KIND)
+        if cached:
+            return cached
+        
+        t = LOUDNESS_TARGET
+        cmd = [
+            self.processor.ffmpeg, "-hide_banner", "-nostats", "-loglevel", "info",
+            "-i", path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+            "-af", f"loudnorm=I={t['I']}:TP={t['TP']}:LRA={t['LRA']}:print_format=json",
+            "-f", "null", "-",
+        ]
+        process = self.processor._spawn(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            _, err = process.communicate()
+        finally:
+            self.processor._release(process)
+        if process.returncode != 0 or self.processor.cancelled:
+            return None
+        
+        # The summary is the last JSON object FFmpeg logs
+        text = err.decode('utf-8', errors='replace')
+        try:
+            measured = json.loads(text[text.rindex('{'):text.rindex('}') + 1])
+        except ValueError:
+            return None
+        if measured.get('input_i') in (None, "-inf") or measured.get('input_thresh') == "-inf":
+            return None
+        self.processor.cache.put_analysis(path, LOUDNESS_KIND, measured)
+        return measured
+
+    def _run(self, path, duration, progress_callback):
+        fd, audio_path = tempfile.mkstemp(prefix="ape-audio-", suffix=".pcm")
+        os.close(fd)
+
+        sampler = FrameSampler(self.processor, ANALYSIS_FPS, FRAME_W, FRAME_H, 'gray')
+        scenes = SceneScorer()
+        try:
+            # Audio: low-rate mono PCM from the same decode is plenty for level/silence
+            ok = sampler.run(path, [scenes], duration=duration, progress_callback=progress_callback, extra_outputs=[
+                "-map", "0:a:0?", "-ac", "1", "-ar", str(AUDIO_RATE), "-f", "s16le", audio_path,
+            ])
+            rms_db, voice = self._audio_levels(audio_path) if ok else ([], [])
+        finally:
+            try:
+                os.remove(audio_path)
+            except OSError:
+                pass
+
+        scene = scenes.scores
+        if not ok or not scene:
+            return None
+        # Put both curves on the video grid. No audio reads as constant level (never silent)
+        pad = rms_db[-1] if rms_db else 0.0
+        rms_db = (rms_db + [pad] * len(scene))[:len(scene)]
+        voice = (voice + [0.0] * len(scene))[:len(scene)]
+        return {
+            'step': 1.0 / ANALYSIS_FPS,
+            'scene': [round(v, 4) for v in scene],
+            'rms_db': [round(v, 1) for v in rms_db],
+            'voice': [round(v, 3) for v in voice],
+        }
+
+    def _audio_levels(self, audio_path):
+        """RMS level in dBFS and voice-band energy share per grid step, computed a block at a time."""
+        win = AUDIO_RATE // ANALYSIS_FPS
+        block = win * ANALYSIS_FPS * 600  # ~10 minutes of samples per read
+        freqs = np.fft.rfftfreq(win, 1.0 / AUDIO_RATE)
+        band = (freqs >= VOICE_BAND[0]) & (freqs <= VOICE_BAND[1])
+        levels = []
+        voice = []
+        with open(audio_path, 'rb') as f:
+            while True:
+                samples = np.fromfile(f, dtype=np.int16, count=block)
+                if samples.size < win:
+                    break
+                frames = samples[:samples.size - samples.size % win].astype(np.float32).reshape(-1, win)
+                rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+                levels.extend(np.maximum(20 * np.log10(np.maximum(rms, 1e-9)), SILENCE_DB).tolist())
+                power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+                voice.extend((power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-9)).tolist())
+        return levels, voice
+
+
+def loudnorm_filter(measured):
+    """Single-pass loudnorm using the source's measured values.
+
+    With measurements supplied and linear=true, loudnorm applies one constant
+    gain (falling back to dynamic mode only if that gain would clip), so every
+    part of a source gets the same correction. It works at 192 kHz internally,
+    hence the resample back.
+    """
+    t = LOUDNESS_TARGET
+    return (
+        f"loudnorm=I={t['I']}:TP={t['TP']}:LRA={t['LRA']}"
+        f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}:linear=true,aresample=48000"
+    )
+
+
+def _runs(mask):
+    """(starts, ends) index arrays of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def plan_trims(analysis, duration):
+    """Spans of the source worth keeping: everything except dead air.
+
+    Dead air is a stretch that is both silent and frozen for at least
+    DEAD_AIR_MIN seconds, or silent for DEAD_AIR_LONG. Returns [(start, end)]
+    on the source timeline, or None if nothing needs trimming.
+    """
+    if not analysis or not NUMPY_AVAILABLE:
+        return None
+    step = analysis['step']
+    level = np.asarray(analysis['rms_db'], dtype=np.float32)
+    scene = np.asarray(analysis['scene'], dtype=np.float32)
+    silent = level <= DEAD_AIR_DB
+
+    dead = np.zeros(len(level), dtype=bool)
+    for mask, seconds in ((silent & (scene <= FROZEN_SCENE), DEAD_AIR_MIN), (silent, DEAD_AIR_LONG)):
+        starts, ends = _runs(mask)
+        for a, b in zip(starts, ends):
+            if (b - a) * step >= seconds:
+                dead[a:b] = True
+
+    starts, ends = _runs(dead)
+    if not len(starts):
+        return None
+    keep = []
+    cursor = 0.0
+    for a, b in zip(starts, ends):
+        cut_start = a * step + DEAD_AIR_PAD if a else 0.0
+        cut_end = min(b * step - DEAD_AIR_PAD, duration) if b < len(dead) else duration
+        if cut_end - cut_start < step:
+            continue
+        # Slivers between two trims are dead air too
+        if cut_start - cursor >= 2 * step:
+            keep.append((float(cursor), float(cut_start)))
+        cursor = cut_end
+    if duration - cursor >= 2 * step:
+        keep.append((float(cursor), float(duration)))
+    return keep
+
+
+def plan_content_parts(keep, chunk_len):
+    """Fill parts of chunk_len seconds from the kept spans.
+
+    Returns one list of (start, length) source spans per part; a part may
+    straddle trimmed stretches. A tail under a second joins the last part.
+    """
+    parts = []
+    current = []
+    need = chunk_len
+    for a, b in keep:
+        while b - a > 1e-3:
+            take = min(need, b - a)
+            current.append((a, take))
+            a += take
+            need -= take
+            if need <= 1e-3:
+                parts.append(current)
+                current = []
+                need = chunk_len
+    if current:
+        if parts and sum(length for _, length in current) < 1.0:
+            parts[-1].extend(current)
+        else:
+            parts.append(current)
+    return parts
+
+
+def plan_highlights(analysis, length, count):
+    """Pick the count best non-overlapping windows of length seconds.
+
+    Every grid step is scored from audio energy (loud relative to the
+    source), speech density (voiced steps) and motion; windows are ranked by
+    their summed score with one cumulative sum, and the best are taken
+    greedily, each suppressing the windows that overlap it. Returns
+    [(start, length)] in source order.
+    """
+    if not analysis or not NUMPY_AVAILABLE:
+        return []
+    step = analysis['step']
+    level = np.asarray(analysis['rms_db'], dtype=np.float32)
+    scene = np.asarray(analysis['scene'], dtype=np.float32)
+    voice = np.asarray(analysis.get('voice') or [0.0] * len(level), dtype=np.float32)
+    width = int(round(length / step))
+    if width < 1 or len(level) < width:
+        return [(0.0, len(level) * step)] if len(level) else []
+
+    # Energy: 0 at the source's median level, 1 at its loud peaks
+    typical, loud = np.percentile(level, [50, 95])
+    energy = np.clip((level - typical) / max(loud - typical, 1.0), 0.0, 1.0)
+    # Speech: voiced and clearly above silence
+    speech = ((voice >= SPEECH_RATIO) & (level > SILENCE_DB + 20)).astype(np.float32)
+    motion = np.clip(scene / SCENE_CUT, 0.0, 1.0)
+    w_energy, w_speech, w_motion = HIGHLIGHT_WEIGHTS
+    score = w_energy * energy + w_speech * speech + w_motion * motion
+
+    cs = np.concatenate([[0.0], np.cumsum(score, dtype=np.float64)])
+    windows = cs[width:] - cs[:-width]
+    picks = []
+    for _ in range(count):
+        best = int(np.argmax(windows))
+        if windows[best] == -np.inf:
+            break
+        picks.append(best)
+        windows[max(best - width + 1, 0):best + width] = -np.inf
+    return [(i * step, width * step) for i in sorted(picks)]
+
+
+def plan_cuts(parts, analysis, window):
+    """Move each interior cut to the best moment within +-window seconds.
+
+    Quiet moments and scene changes score high; distance from the nominal
+    cut costs a little, so an unremarkable stretch keeps the original cut.
+    parts is a list of (start, length); the same shape is returned.
+    """
+    if not analysis or len(parts) < 2 or not NUMPY_AVAILABLE:
+        return parts
+    step = analysis['step']
+    scene = np.asarray(analysis['scene'], dtype=np.float32)
+    level = np.asarray(analysis['rms_db'], dtype=np.float32)
+
+    # Quietness: 1 at digital silence, 0 at the source's typical loudness
+    typical = float(np.median(level))
+    quiet = np.clip((typical - level) / max(typical - SILENCE_DB, 1.0), 0.0, 1.0)
+    # Scene change strength, saturating at a typical hard cut
+    change = np.clip(scene / SCENE_CUT, 0.0, 1.0)
+    score = 0.6 * quiet + 0.4 * change
+
+    end = parts[-1][0] + parts[-1][1]
+    cuts = [0.0]
+    for start, _ in parts[1:]:
+        lo = max(int((start - window) / step), int(cuts[-1] / step) + 1)
+        hi = min(int((start + window) / step), len(score) - 1)
+        if lo > hi:
+            cuts.append(start)
+            continue
+        idx = np.arange(lo, hi + 1)
+        penalty = 0.2 * np.abs(idx * step - start) / max(window, step)
+        best = int(idx[np.argmax(score[lo:hi + 1] - penalty)])
+        cuts.append(best * step)
+    cuts.append(end)
+    return [(cuts[i], cuts[i + 1] - cuts[i]) for i in range(len(parts))]
@@ -1,8 +1,14 @@
 import sqlite3
 import os
 import datetime
+import json
 import csv
 
+from modules.fingerprint import band_keys, similarity, is_duplicate
+
+# Most-colliding sources checked in full per lookup
+CANDIDATES = 20
+
 class HistoryManager:
     def __init__(self, db_path="history.db"):
         self.db_path = os.path.join(os.path.dirname(__file__), '..', db_path)
@@ -19,19 +25,32 @@ class HistoryManager:
                       account TEXT, 
                       status TEXT,
                       file_path TEXT)''')
+        # Cover images / contact sheet of the parts (JSON), added after release
+        columns = [row[1] for row in c.execute("PRAGMA table_info(posted_videos)")]
+        if 'thumbnails' not in columns:
+            c.execute("ALTER TABLE posted_videos ADD COLUMN thumbnails TEXT")
+        # Perceptual fingerprints for near-duplicate detection, plus their LSH band index
+        c.execute('''CREATE TABLE IF NOT EXISTS fingerprints
+                     (url TEXT PRIMARY KEY,
+                      data TEXT)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS fingerprint_bands
+                     (band_key INTEGER,
+                      url TEXT)''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_fingerprint_bands ON fingerprint_bands (band_key)")
         conn.commit()
         conn.close()
 
-    def add_entry(self, url, title, account, status="Posted", file_path=""):
-        """Add or update a video entry."""
+    def add_entry(self, url, title, account, status="Posted", file_path="", thumbnails=None):
+        """Add or update a video entry. thumbnails: {'covers': [...], 'sheet': path} or None."""
         try:
             conn = sqlite3.connect(self.db_path)
             c = conn.cursor()
             date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             c.execute('''INSERT OR REPLACE INTO posted_videos 
-                         (url, title, date, account, status, file_path) 
-                         VALUES (?, ?, ?, ?, ?, ?)''', 
-                      (url, title, date_str, account, status, file_path))
+                         (url, title, date, account, status, file_path, thumbnails) 
+                         VALUES (?, ?, ?, ?, ?, ?, ?)''', 
+                      (url, title, date_str, account, status, file_path,
+                       json.dumps(thumbnails) if thumbnails else None))
             conn.commit()
             conn.close()
             return True
@@ -48,6 +67,54 @@ class HistoryManager:
         conn.close()
         return result is not None
 
+    def add_fingerprint(self, url, fingerprint):
+        """Store a source's fingerprint (from modules.fingerprint) and index its bands."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute("INSERT OR REPLACE INTO fingerprints (url, data) VALUES (?, ?)", (url, json.dumps(fingerprint)))
+            c.execute("DELETE FROM fingerprint_bands WHERE url=?", (url,))
+            c.executemany("INSERT INTO fingerprint_bands (band_key, url) VALUES (?, ?)",
+                          [(key, url) for key in band_keys(fingerprint['frames'])])
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"DB Error: {e}")
+            return False
+
+    def find_similar(self, fingerprint):
+        """Closest earlier source that is a near-duplicate of fingerprint.
+
+        Returns {'url', 'title', 'frames', 'audio'} (match shares) or None.
+        Only sources sharing LSH bands with it are compared in full.
+        """
+        keys = list(band_keys(fingerprint['frames']))
+        if not keys:
+            return None
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        counts = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            c.execute(f"SELECT url, COUNT(*) FROM fingerprint_bands WHERE band_key IN ({','.join('?' * len(chunk))}) "
+                      "GROUP BY url", chunk)
+            for url, n in c.fetchall():
+                counts[url] = counts.get(url, 0) + n
+        best = None
+        for url in sorted(counts, key=counts.get, reverse=True)[:CANDIDATES]:
+            c.execute("SELECT f.data, p.title FROM fingerprints f LEFT JOIN posted_videos p ON p.url = f.url "
+                      "WHERE f.url=?", (url,))
+            row = c.fetchone()
+            if not row:
+                continue
+            frames, audio = similarity(fingerprint, json.loads(row[0]))
+            if is_duplicate(frames, audio) and (not best or frames > best['frames']):
+                best = {'url': url, 'title': row[1], 'frames': frames, 'audio': audio}
+        conn.close()
+        return best
+
     def get_all_history(self):
         """Retrieve all history for export."""
         conn = sqlite3.connect(self.db_path)
@@ -1,19 +1,264 @@
 import yt_dlp
 import os
+import sys
+import json
+import copy
 import time
+import tempfile
+import queue
+import threading
+import subprocess
+from concurrent.futures import Future, CancelledError
+
+from modules.supervisor import SUPERVISOR
+
+# Shared by file downloads and streams so both pick the same source
+FORMAT = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+# Smallest muxed format: enough for a perceptual fingerprint, cheap to fetch
+PREVIEW_FORMAT = 'worst[vcodec!=none][acodec!=none]/worst'
+# Prefetched page info stays usable this long (format URLs expire after a few hours)
+INFO_TTL = 1800
+PREFETCH_WORKERS = 4    # Concurrent metadata-only extractions
+# Connections shared by concurrent downloads (fragments of HLS/DASH formats fetched at once)
+CONNECTIONS = 16
+# Parts never need a higher rate; faster streams are only fetched when nothing else fills the frame
+TARGET_FPS = 30
+# Relative CPU cost of decoding a pixel, by codec (software decoders, H.264 = 1)
+DECODE_COST = {'avc1': 1.0, 'h264': 1.0, 'vp8': 1.2, 'hev1': 1.5, 'hvc1': 1.5, 'vp09': 1.5, 'vp9': 1.5, 'av01': 2.5}
+DECODE_MPIXELS = 300    # Software H.264 decode speed assumed for the decode-time estimate (Mpixel/s)
+
+def _decode_cost(f):
+    return DECODE_COST.get((f.get('vcodec') or '').split('.')[0].lower(), 2.0)
+
+def _format_bytes(f, duration):
+    return f.get('filesize') or f.get('filesize_approx') or (f.get('tbr') or 0) * 125 * duration
+
+def _decode_seconds(f, duration):
+    pixels = (f.get('width') or 0) * (f.get('height') or 0) * (f.get('fps') or TARGET_FPS)
+    return pixels * duration * _decode_cost(f) / (DECODE_MPIXELS * 1e6)
+
+def _fills(f, frames):
+    """Whether format f covers every output frame without upscaling."""
+    w, h = f.get('width'), f.get('height')
+    if not w or not h:
+        return False
+    # A smart-cropped frame is a full-height window; a fit frame only needs one side
+    return all(h >= fh if cropped else (w >= fw or h >= fh) for fw, fh, cropped in frames)
+
+def select_format(info, frames):
+    """The smallest source that still fills frames (VideoProcessor.output_frames), from info's formats.
+
+    Among the formats covering every frame at TARGET_FPS (or the source's
+    own rate, if lower), the lowest resolution wins, then the lower frame
+    rate, the codec cheapest to decode and the smaller file. If none
+    covers them, the largest one. Returns None when frames is None or
+    info lists no usable formats (FORMAT applies), otherwise a dict:
+    spec (a -f format spec), label, bytes (expected total) and, compared
+    to what FORMAT fetches, bytes_saved and decode_saved (estimated seconds).
+    """
+    if not frames:
+        return None
+    formats = [f for f in info.get('formats') or [] if f.get('format_id') and not f.get('has_drm')]
+    duration = info.get('duration') or 0
+    video = [f for f in formats if f.get('vcodec') not in (None, 'none') and f.get('height')]
+    audio = [f for f in formats if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+    video_only = [f for f in video if f.get('acodec') == 'none']
+    # Separate streams when both kinds exist, like FORMAT; muxed ones otherwise
+    candidates = video_only if video_only and audio else [f for f in video if f.get('acodec') != 'none']
+    if not candidates:
+        return None
+
+    fps = min(TARGET_FPS, max(f.get('fps') or 0 for f in candidates) or TARGET_FPS)
+    fitting = [f for f in candidates if _fills(f, frames) and (f.get('fps') or fps) >= fps]
+    if fitting:
+        pick = min(fitting, key=lambda f: (f['height'], f.get('fps') or fps, _decode_cost(f), _format_bytes(f, duration)))
+    else:
+        pick = max(candidates, key=lambda f: (f['height'], -_decode_cost(f)))
+    # What FORMAT's bestvideo[ext=mp4] / best[ext=mp4] comes to
+    mp4 = [f for f in candidates if f.get('ext') == 'mp4'] or candidates
+    base = max(mp4, key=lambda f: (f['height'], f.get('fps') or 0, f.get('tbr') or 0))
+
+    spec, size = pick['format_id'], _format_bytes(pick, duration)
+    if pick in video_only:
+        # AAC first, like FORMAT: cheap to decode and muxes into MP4
+        sound = max(audio, key=lambda f: (f.get('ext') == 'm4a', f.get('abr') or f.get('tbr') or 0))
+        spec += f"+{sound['format_id']}"
+        size += _format_bytes(sound, duration)
+    codec = (pick.get('vcodec') or '').split('.')[0]
+    return {
+        'spec': spec,
+        'label': f"{pick['height']}p{round(pick.get('fps') or 0) or ''} {codec}".strip(),
+        'bytes': size,
+        'bytes_saved': _format_bytes(base, duration) - _format_bytes(pick, duration),
+        'decode_saved': _decode_seconds(base, duration) - _decode_seconds(pick, duration),
+    }
+
+def describe_format(choice):
+    """One log line for a select_format result."""
+    saved, decode = choice['bytes_saved'], choice['decode_saved']
+    if saved <= 0 and decode <= 0:
+        return f"Source format: {choice['label']} (no smaller source fills the output)"
+    # A cheaper codec can cost a few more bytes
+    fetch = f"{abs(saved) / 2**20:.0f} MB {'less' if saved >= 0 else 'more'} to fetch"
+    return f"Source format: {choice['label']} - {fetch}, ~{max(decode, 0):.0f}s less decoding (est.)"
+
+class InfoCache:
+    """Metadata-only extraction of queued URLs on a bounded pool, cached with a TTL.
+
+    Entries are yt-dlp's sanitized info dicts, so a download can hand one
+    straight to process_ie_result (or --load-info-json) instead of
+    extracting the page again. The workers are daemon threads, so queued
+    extractions never hold up closing the app.
+    """
+    def __init__(self, ttl=INFO_TTL, workers=PREFETCH_WORKERS):
+        self.ttl = ttl
+        self.workers = workers
+        self.threads = []
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.entries = {}   # url -> (time extracted, info)
+        self.pending = {}   # url -> Future of an extraction in flight
+
+    def _work(self):
+        while True:
+            url, future = self.queue.get()
+            # False once cancelled before it started
+            if future.set_running_or_notify_cancel():
+                future.set_result(self._fetch(url))
+
+    def _extract(self, url):
+        ffmpeg_path = os.path.join(os.path.dirname(__file__), '..', 'bin')
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True,
+                               'format': FORMAT, 'ffmpeg_location': ffmpeg_path}) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    def _fetch(self, url):
+        try:
+            info = self._extract(url)
+        except Exception:
+            # Not cached: the download extracts it again and reports the error
+            info = None
+        with self.lock:
+            self.pending.pop(url, None)
+            if info:
+                self.entries[url] = (time.time(), info)
+        return info
+
+    def _fresh(self, url):
+        entry = self.entries.get(url)
+        return entry[1] if entry and time.time() - entry[0] < self.ttl else None
+
+    def prefetch(self, urls):
+        """Queue metadata extraction for every URL not already cached or in flight."""
+        with self.lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"prefetch-{len(self.threads)}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            for url in urls:
+                if url not in self.pending and self._fresh(url) is None:
+                    future = self.pending[url] = Future()
+                    self.queue.put((url, future))
+
+    def get(self, url, wait=True):
+        """A copy of url's cached info, waiting for an extraction in flight. None if unknown or failed."""
+        with self.lock:
+            info = self._fresh(url)
+            future = self.pending.get(url)
+        if info is None and future and wait:
+            try:
+                info = future.result()
+            except CancelledError:
+                info = None
+        # Downloads add their own keys to the dict they are given
+        return copy.deepcopy(info) if info else None
+
+    def load(self, url):
+        """Cached info for url, or extract it now (and cache it). Raises on extraction errors."""
+        info = self.get(url)
+        if info:
+            return info
+        info = self._extract(url)
+        with self.lock:
+            self.entries[url] = (time.time(), info)
+        return copy.deepcopy(info)
+
+    def cancel(self):
+        """Drop extractions that haven't started yet."""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+
+class DownloadStream:
+    """A download piped to stdout by a yt-dlp child, for processing while it arrives."""
+    def __init__(self, process, info, info_path):
+        self.process = process
+        self.stdout = process.stdout
+        self.info_path = info_path
+        self.title = info.get('title', 'Untitled')
+        self.duration = info.get('duration') or 0
+        self.id = f"{info.get('extractor_key', '')}:{info.get('id', '')}"
+        # Best guess at the total, for download progress while streaming
+        formats = info.get('requested_formats') or [info]
+        self.expected_bytes = sum((f.get('filesize') or f.get('filesize_approx') or 0) for f in formats)
+        # Nothing to probe before the bytes arrive; an unknown codec counts as audio
+        self.has_audio = any(f.get('acodec') != 'none' for f in formats)
+
+    def close(self):
+        """Stop the download (if still running) and clean up."""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        SUPERVISOR.release(self.process)
+        try:
+            os.remove(self.info_path)
+        except OSError:
+            pass
 
 class VideoDownloader:
-    def __init__(self, output_dir="downloads"):
+    def __init__(self, output_dir="downloads", infos=None):
         self.output_dir = output_dir
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         self.last_error = None
         self.last_title = None
+        self.stream = None
+        self.infos = infos or InfoCache()
+        # Output frames (VideoProcessor.output_frames) the source is chosen for; None = FORMAT
+        self.frames = None
+        self.last_format = None
+        self.cancelled = False
+        self.ffmpeg = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'bin', 'ffmpeg.exe'))
+
+    def cancel(self):
+        self.cancelled = True
+        if self.stream:
+            self.stream.close()
+        # A merge or preview in flight
+        SUPERVISOR.stop(owner=self, wait=False)
+
+    def prefetch(self, urls):
+        """Extract page info for urls in the background; downloads of them then skip extraction."""
+        self.infos.prefetch(urls)
+
+    def queued_duration(self, urls):
+        """(total seconds, number of urls with a known duration), from prefetched info only."""
+        durations = [(self.infos.get(url, wait=False) or {}).get('duration') for url in urls]
+        known = [d for d in durations if d]
+        return sum(known), len(known)
 
-    def download_video(self, url, progress_callback=None):
-        """Download video and return (filepath, title) or (None, error_message)"""
+    def download_video(self, url, progress_callback=None, params=None):
+        """Download video and return (filepath, title) or (None, error_message)
+
+        params are extra yt-dlp options. The dict itself becomes the
+        YoutubeDL's params, so the caller can change e.g. 'ratelimit' while
+        the download runs; its 'progress_hooks' run after our own.
+        """
         self.last_error = None
         self.last_title = None
+        self.last_format = None
+        self.cancelled = False
 
         # Closure state for throttling
         state = {'last_time': 0}
@@ -33,7 +278,7 @@ class VideoDownloader:
                     progress_callback(None, f"Downloading: {p} | Speed: {s} | ETA: {e}")
                     state['last_time'] = now
             elif d['status'] == 'finished':
-                progress_callback(None, "Download finished, converting...")
+                progress_callback(None, "Download finished")
 
         ffmpeg_path = os.path.join(os.path.dirname(__file__), '..', 'bin')
         
@@ -44,43 +289,64 @@ class VideoDownloader:
             
         ydl_opts = {
             'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'merge_output_format': 'mp4',
+            'format': FORMAT,
+            # Separate video/audio are merged by stream copy: MP4 when the codecs
+            # fit, MKV otherwise. Nothing is transcoded; the processor decodes any container.
+            'merge_output_format': 'mp4/mkv',
+            # yt-dlp's fixups run FFmpeg outside the supervisor; the processor decodes the files as they are
+            'fixup': 'never',
             'noplaylist': True,
             'quiet': True,
             'no_warnings': True,
             'no_color': True,
             'progress_hooks': [progress_hook],
             'ffmpeg_location': ffmpeg_path,
-            'postprocessors': [{
-                'key': 'FFmpegVideoConvertor',
-                'preferedformat': 'mp4',
-            }],
         }
+        if params is not None:
+            params['progress_hooks'] = ydl_opts['progress_hooks'] + params.get('progress_hooks', [])
+            for key, value in ydl_opts.items():
+                params.setdefault(key, value)
+            ydl_opts = params
         
         try:
+            # Prefetched, or extracted now: formats are picked before anything downloads
+            info = self.infos.load(url)
+            self.last_format = select_format(info, self.frames)
+            if self.last_format:
+                ydl_opts['format'] = self.last_format['spec']
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
-                
-                # Handle merged format filename
-                if not os.path.exists(filename):
-                    # Try with .mp4 extension
-                    base = os.path.splitext(filename)[0]
-                    if os.path.exists(base + '.mp4'):
-                        filename = base + '.mp4'
-                
-                # Move from temp to main output_dir
-                if os.path.exists(filename):
-                    final_name = os.path.join(self.output_dir, os.path.basename(filename))
-                    if os.path.exists(final_name):
-                        os.remove(final_name) # Overwrite if exists
-                    os.rename(filename, final_name)
-                    filename = final_name
-
-                self.last_title = info.get('title', 'Untitled')
-                return filename
-                
+                chosen = ydl.process_ie_result(copy.deepcopy(info), download=False)
+                # Named for the merged container yt-dlp would have written
+                filename = ydl.prepare_filename(chosen)
+            
+            # Each format is fetched on its own and the merge is ours, so its FFmpeg
+            # runs under the supervisor instead of yt-dlp's unsupervised one
+            formats = chosen.get('requested_formats') or [chosen]
+            if len(formats) > 1:
+                ydl_opts['outtmpl'] = os.path.join(temp_dir, '%(title)s.f%(format_id)s.%(ext)s')
+            pieces = []
+            for f in formats:
+                ydl_opts['format'] = f['format_id']
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    got = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                    downloads = got.get('requested_downloads') or []
+                    pieces.append(downloads[0].get('filepath') if downloads else ydl.prepare_filename(got))
+            if len(pieces) > 1:
+                self._merge(pieces, filename)
+            else:
+                filename = pieces[0]
+            
+            # Move from temp to main output_dir
+            if os.path.exists(filename):
+                final_name = os.path.join(self.output_dir, os.path.basename(filename))
+                if os.path.exists(final_name):
+                    os.remove(final_name) # Overwrite if exists
+                os.rename(filename, final_name)
+                filename = final_name
+
+            self.last_title = info.get('title', 'Untitled')
+            return filename
+            
         except yt_dlp.utils.DownloadError as e:
             self.last_error = f"Download error: {str(e)}"
             return None
@@ -91,16 +357,131 @@ class VideoDownloader:
             self.last_error = f"Error: {str(e)}"
             return None
 
+    def _merge(self, pieces, out_path):
+        """Stream-copy separately downloaded video and audio into out_path with a supervised FFmpeg."""
+        if self.cancelled:
+            raise yt_dlp.utils.DownloadCancelled()
+        cmd = [self.ffmpeg, "-y", "-hide_banner", "-loglevel", "error"]
+        for piece in pieces:
+            cmd.extend(["-i", piece])
+        for n in range(len(pieces)):
+            cmd.extend(["-map", str(n)])
+        cmd.extend(["-c", "copy", out_path])
+        returncode, _, err = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if self.cancelled:
+            raise yt_dlp.utils.DownloadCancelled()
+        if returncode != 0:
+            raise RuntimeError(f"Merge failed: {err.decode('utf-8', 'replace').strip() or returncode}")
+        for piece in pieces:
+            try:
+                os.remove(piece)
+            except OSError:
+                pass
+
+    def download_preview(self, url, seconds=60):
+        """Download just the opening seconds of the smallest format. Returns a path or None.
+
+        Used to fingerprint a source before committing to the full download.
+        The range is cut by FFmpeg inside yt-dlp, so yt-dlp runs as a
+        supervised child (like open_stream) that prints the finished path.
+        """
+        self.last_error = None
+        ffmpeg_path = os.path.join(os.path.dirname(__file__), '..', 'bin')
+        temp_dir = os.path.join(self.output_dir, "temp")
+        if not os.path.exists(temp_dir):
+            os.makedirs(temp_dir)
+        try:
+            info = self.infos.load(url)
+        except Exception as e:
+            self.last_error = f"Preview error: {str(e)}"
+            return None
+
+        fd, info_path = tempfile.mkstemp(prefix="ape-info-", suffix=".json")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        cmd = [
+            sys.executable, "-m", "yt_dlp",
+            "--load-info-json", info_path,
+            "-f", PREVIEW_FORMAT,
+            "--download-sections", f"*0-{seconds}",
+            "--force-overwrites",
+            "-o", os.path.join(temp_dir, 'preview-%(id)s.%(ext)s'),
+            "--print", "after_move:filepath",
+            "--no-warnings", "--no-color",
+            "--ffmpeg-location", ffmpeg_path,
+        ]
+        try:
+            returncode, out, err = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            self.last_error = f"Preview error: {str(e)}"
+            return None
+        finally:
+            os.remove(info_path)
+        lines = out.decode('utf-8', 'replace').strip().splitlines()
+        filename = lines[-1] if lines else None
+        if returncode != 0 or not filename or not os.path.exists(filename):
+            tail = err.decode('utf-8', 'replace').strip().splitlines()
+            self.last_error = f"Preview error: {tail[-1] if tail else f'yt-dlp exited with code {returncode}'}"
+            return None
+        return filename
+
+    def open_stream(self, url):
+        """Start a download that writes media to a pipe. Returns a DownloadStream or None.
+
+        The page is extracted once (here, or earlier by prefetch) for title,
+        duration and size, and the result is handed to the yt-dlp child with
+        --load-info-json, so the child goes straight to downloading.
+        """
+        self.last_error = None
+        self.last_title = None
+        self.last_format = None
+        ffmpeg_path = os.path.join(os.path.dirname(__file__), '..', 'bin')
+        try:
+            info = self.infos.load(url)
+        except Exception as e:
+            self.last_error = f"Cannot extract video: {str(e)}"
+            return None
+
+        if not info.get('duration'):
+            self.last_error = "Streaming needs a known duration (live streams are not supported)"
+            return None
+
+        self.last_format = select_format(info, self.frames)
+        fd, info_path = tempfile.mkstemp(prefix="ape-info-", suffix=".json")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+
+        cmd = [
+            sys.executable, "-m", "yt_dlp",
+            "--load-info-json", info_path,
+            "-f", self.last_format['spec'] if self.last_format else FORMAT,
+            "-o", "-",
+            "--quiet", "--no-warnings", "--no-part",
+            "--ffmpeg-location", ffmpeg_path,
+        ]
+        try:
+            # Supervised: its FFmpeg merge inherits the same priority and limits
+            process = SUPERVISOR.spawn(cmd, owner=self, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except Exception as e:
+            os.remove(info_path)
+            self.last_error = f"Error: {str(e)}"
+            return None
+
+        self.stream = DownloadStream(process, info, info_path)
+        if self.last_format:
+            self.stream.expected_bytes = self.last_format['bytes']
+        self.last_title = self.stream.title
+        return self.stream
+
     def get_video_info(self, url):
-        """Get video info without downloading"""
+        """Get video info without downloading (prefetched info when there is some)"""
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(url, download=False)
-                return {
-                    'title': info.get('title', 'Untitled'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Unknown'),
-                }
+            info = self.infos.load(url)
+            return {
+                'title': info.get('title', 'Untitled'),
+                'duration': info.get('duration', 0),
+                'uploader': info.get('uploader', 'Unknown'),
+            }
         except Exception as e:
             self.last_error = str(e)
             return None
@@ -128,3 +509,181 @@ class VideoDownloader:
             self.last_error = str(e)
         
         return video_urls
+
+
+class DownloadJob:
+    """One download run by DownloadManager.
+
+    done is set when it has finished; filepath (None on failure), title,
+    error and format are final from then on.
+    """
+    def __init__(self, url):
+        self.url = url
+        self.done = threading.Event()
+        self.filepath = None
+        self.title = None
+        self.error = None
+        self.cancelled = False
+        # select_format's choice, when the source was picked for the outputs
+        self.format = None
+        # The VideoDownloader running it, once started
+        self.downloader = None
+        # Bytes per file being fetched (video and audio arrive separately before the merge)
+        self.files = {}
+        self.speed = 0.0
+
+    def fraction(self):
+        if self.done.is_set():
+            return 1.0
+        total = sum(t for _, t in self.files.values())
+        return sum(d for d, _ in self.files.values()) / total if total else 0.0
+
+
+class DownloadManager:
+    """Several downloads at once under one bandwidth and connection budget.
+
+    Each submitted URL downloads on its own thread once one of concurrency
+    slots is free; the slot count can change at any time. The bandwidth
+    budget (bytes/s, None = unlimited) is one token bucket shared by every
+    download: each progress update pays for the bytes it reports, and the
+    thread that reported them sleeps off any debt. yt-dlp calls the hooks
+    from whichever thread fetched the bytes, fragment threads included,
+    so the budget covers the total and a change applies at once.
+    Each download fetches up to connections / concurrency fragments at once.
+
+    progress_callback(pct, msg) gets one line for everything in flight:
+    overall percentage, each running download's percentage and total speed.
+    """
+    def __init__(self, downloader, concurrency=2, bandwidth=None, connections=CONNECTIONS, progress_callback=None):
+        # Shares the downloader's output folder and prefetched page info
+        self.downloader = downloader
+        self.concurrency = max(1, concurrency)
+        self.bandwidth = bandwidth or None
+        self.connections = connections
+        self.progress_callback = progress_callback
+        self.cond = threading.Condition()
+        self.jobs = {}      # url -> DownloadJob
+        self.live = {}      # running DownloadJob -> its YoutubeDL params
+        self.last_report = 0.0
+        # Token bucket for the bandwidth budget: bytes that may be fetched now (negative = debt)
+        self.allowance = 0.0
+        self.refilled = time.time()
+
+    def submit(self, url):
+        """Start (or join) the download of url. Returns its DownloadJob."""
+        with self.cond:
+            job = self.jobs.get(url)
+            # Start over after a cancel, a failure, or once the file is gone (deleted after upload)
+            stale = job and (job.cancelled or job.done.is_set() and not (job.filepath and os.path.exists(job.filepath)))
+            if job is None or stale:
+                job = self.jobs[url] = DownloadJob(url)
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+            return job
+
+    def set_concurrency(self, concurrency):
+        """Change the number of downloads run at once. Downloads already running are never stopped."""
+        with self.cond:
+            self.concurrency = max(1, concurrency)
+            self.cond.notify_all()
+
+    def set_bandwidth(self, bandwidth):
+        """Change the total bandwidth budget (bytes/s, None = unlimited), including for running downloads."""
+        with self.cond:
+            self.bandwidth = bandwidth or None
+            self.allowance = 0.0
+            self.refilled = time.time()
+
+    def cancel(self, url=None):
+        """Abort the download of url (every download if None) at its next progress update."""
+        with self.cond:
+            for job in self.jobs.values():
+                if url is None or job.url == url:
+                    job.cancelled = True
+                    # Its merge, if one is running
+                    if job.downloader:
+                        job.downloader.cancel()
+            self.cond.notify_all()
+
+    def _throttle(self, job, nbytes):
+        """Charge nbytes to the shared budget, holding the calling download thread until it is paid."""
+        with self.cond:
+            if not self.bandwidth or nbytes <= 0:
+                return
+            now = time.time()
+            # Refills at the budget rate, banking at most a second's worth
+            self.allowance = min(self.allowance + (now - self.refilled) * self.bandwidth, self.bandwidth)
+            self.refilled = now
+            self.allowance -= nbytes
+            wait = -self.allowance / self.bandwidth
+        # Short sleeps, so a cancel still lands quickly
+        deadline = time.time() + wait
+        while not job.cancelled and time.time() < deadline:
+            time.sleep(min(deadline - time.time(), 0.2))
+
+    def _run(self, job):
+        with self.cond:
+            while len(self.live) >= self.concurrency and not job.cancelled:
+                self.cond.wait()
+            if not job.cancelled:
+                params = {
+                    'concurrent_fragment_downloads': max(1, self.connections // self.concurrency),
+                    'progress_hooks': [lambda d: self._hook(job, d)],
+                }
+                self.live[job] = params
+        try:
+            if not job.cancelled:
+                # A downloader per job: last_title / last_error are per download
+                downloader = job.downloader = VideoDownloader(self.downloader.output_dir, infos=self.downloader.infos)
+                downloader.frames = self.downloader.frames
+                job.filepath = downloader.download_video(job.url, params=params)
+                job.title = downloader.last_title
+                job.format = downloader.last_format
+                job.error = "Cancelled" if job.cancelled else downloader.last_error
+            else:
+                job.error = "Cancelled"
+        finally:
+            with self.cond:
+                self.live.pop(job, None)
+                self.cond.notify_all()
+            job.done.set()
+            self._report(force=True)
+
+    def _hook(self, job, d):
+        if job.cancelled:
+            raise yt_dlp.utils.DownloadCancelled()
+        name = d.get('filename') or ''
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        if d['status'] == 'downloading':
+            with self.cond:
+                # Fragment threads report the same file concurrently, not always in order
+                before = job.files.get(name, (0, 0))[0]
+                downloaded = max(d.get('downloaded_bytes') or 0, before)
+                job.files[name] = (downloaded, total)
+            job.speed = d.get('speed') or 0.0
+            self._throttle(job, downloaded - before)
+        elif d['status'] == 'finished':
+            size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            job.files[name] = (size, size)
+            job.speed = 0.0
+        self._report()
+
+    def _report(self, force=False):
+        if not self.progress_callback:
+            return
+        with self.cond:
+            now = time.time()
+            # Throttle to 10 updates per second across every download
+            if not force and now - self.last_report < 0.1:
+                return
+            self.last_report = now
+            jobs = list(self.jobs.values())
+            running = list(self.live)
+        if not jobs:
+            return
+        pct = int(sum(job.fraction() for job in jobs) / len(jobs) * 100)
+        done = sum(1 for job in jobs if job.done.is_set())
+        each = " ".join(f"{int(job.fraction() * 100)}%" for job in running)
+        speed = sum(job.speed for job in running)
+        # Consistent prefix for GUI to overwrite
+        self.progress_callback(pct, f"Downloading: {pct}% | {done}/{len(jobs)} done | "
+                                    f"{len(running)} active [{each}] | {speed / 2**20:.1f} MB/s")
@@ -0,0 +1,220 @@
+"""
+Encoder calibration - finds the fastest acceptable libx264 settings for this host.
+
+Encodes a short synthetic clip (lavfi testsrc2 + sine) through the same
+720x1280 filter chain the processor uses, once per combination of preset,
+CRF, thread count and tune, and scores each output's SSIM against the
+unencoded clip. Only combinations at least as good as the default CRF
+(within SSIM_TOLERANCE) are eligible, so a higher CRF never wins on size
+and speed alone. Of those, the fastest whose output is no bigger than
+max_size_ratio x the smallest eligible one wins and is saved per host.
+
+Run from the project root:  python -m modules.encoder_profile
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import platform
+import datetime
+import subprocess
+import tempfile
+import itertools
+
+from modules.supervisor import SUPERVISOR
+
+PROFILE_FILE = os.path.join(os.path.dirname(__file__), '..', 'encoder_profile.json')
+
+# What segment_video used before calibration existed
+DEFAULT_PROFILE = {
+    'preset': 'ultrafast',
+    'crf': 23,
+    'threads': 0,
+    'tune': None,
+}
+
+# SSIM a combination may lose against the default CRF's worst result and still count as the same quality
+SSIM_TOLERANCE = 0.002
+
+def host_id():
+    return platform.node() or "default"
+
+def load_profile(path=PROFILE_FILE):
+    """Return this host's calibrated profile, or the defaults."""
+    profile = dict(DEFAULT_PROFILE)
+    try:
+        with open(path, 'r') as f:
+            profile.update(json.load(f).get(host_id(), {}))
+    except Exception:
+        pass
+    return profile
+
+def save_profile(profile, path=PROFILE_FILE):
+    """Store profile under this host, keeping other hosts' entries."""
+    data = {}
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except Exception:
+        pass
+    data[host_id()] = profile
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+def parts_per_minute(profile, segment_duration):
+    """Expected finished parts per wall-clock minute for one encoder."""
+    realtime = profile.get('realtime', 0)
+    if not realtime or not segment_duration:
+        return 0.0
+    return 60.0 * realtime / segment_duration
+
+
+class EncoderCalibrator:
+    def __init__(self, ffmpeg, clip_seconds=8, fps=30):
+        self.ffmpeg = ffmpeg
+        self.clip_seconds = clip_seconds
+        self.fps = fps
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        SUPERVISOR.stop(owner=self, wait=False)
+
+    def default_matrix(self):
+        cores = SUPERVISOR.cpu_count()
+        threads = sorted({0, max(1, cores // 4), max(1, cores // 2)})
+        return {
+            'preset': ['ultrafast', 'superfast', 'veryfast'],
+            'crf': [23, 26],
+            'threads': threads,
+            'tune': [None, 'fastdecode'],
+        }
+
+    FRAME = "scale=720:1280:force_original_aspect_ratio=decrease,pad=720:1280:(ow-iw)/2:(oh-ih)/2:color=black"
+
+    def _encode(self, settings, out_path):
+        """Encode the synthetic clip once. Returns {fps, size, wall, ssim} or None on failure."""
+        cmd = [
+            self.ffmpeg, "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate={self.fps}",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+            "-t", str(self.clip_seconds),
+            "-vf", self.FRAME,
+            "-c:v", "libx264",
+            "-preset", settings['preset'],
+            "-crf", str(settings['crf']),
+            "-threads", str(settings['threads']),
+        ]
+        if settings['tune']:
+            cmd.extend(["-tune", settings['tune']])
+        cmd.extend(["-c:a", "aac", out_path])
+
+        # Same priority and cores as real renders, so the numbers match them
+        start = time.time()
+        returncode, _, _ = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = time.time() - start
+        if returncode != 0 or not os.path.exists(out_path):
+            return None
+        ssim = self._ssim(out_path)
+        if ssim is None:
+            return None
+        return {
+            'fps': self.clip_seconds * self.fps / wall,
+            'size': os.path.getsize(out_path),
+            'wall': wall,
+            'ssim': ssim,
+        }
+
+    def _ssim(self, out_path):
+        """SSIM (All) of an encoded clip against the same clip before encoding, or None."""
+        cmd = [
+            self.ffmpeg, "-hide_banner", "-nostats",
+            "-i", out_path,
+            "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate={self.fps}",
+            "-lavfi", f"[1:v]{self.FRAME},trim=duration={self.clip_seconds}[ref];[0:v][ref]ssim",
+            "-f", "null", "-",
+        ]
+        returncode, _, err = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        match = re.search(r"SSIM .*All:([\d.]+)", err.decode('utf-8', 'replace')) if returncode == 0 else None
+        return float(match.group(1)) if match else None
+
+    def run(self, matrix=None, progress_callback=None):
+        """Encode every combination in matrix. Returns a list of settings + measurements."""
+        self.cancelled = False
+        matrix = matrix or self.default_matrix()
+        keys = ['preset', 'crf', 'threads', 'tune']
+        combos = list(itertools.product(*[matrix[k] for k in keys]))
+        results = []
+
+        with tempfile.TemporaryDirectory(prefix="ape-calib-") as tmp:
+            out_path = os.path.join(tmp, "calib.mp4")
+            for n, values in enumerate(combos):
+                if self.cancelled:
+                    break
+                settings = dict(zip(keys, values))
+                measured = self._encode(settings, out_path)
+                if measured:
+                    settings.update(measured)
+                    results.append(settings)
+                if progress_callback:
+                    progress_callback(int((n + 1) / len(combos) * 100),
+                                      f"Calibrating {n + 1}/{len(combos)}: {settings['preset']} crf {settings['crf']}")
+        return results
+
+    def pick(self, results, max_size_ratio=1.5):
+        """Fastest result at the default CRF's quality whose output is within max_size_ratio of the smallest such one."""
+        if not results:
+            return None
+        # Quality floor: the worst SSIM at the CRF the processor has always used
+        reference = [r['ssim'] for r in results if r['crf'] == DEFAULT_PROFILE['crf']]
+        if reference:
+            floor = min(reference) - SSIM_TOLERANCE
+            results = [r for r in results if r['ssim'] >= floor]
+        smallest = min(r['size'] for r in results)
+        acceptable = [r for r in results if r['size'] <= smallest * max_size_ratio]
+        return max(acceptable, key=lambda r: r['fps'])
+
+    def calibrate(self, matrix=None, max_size_ratio=1.5, progress_callback=None):
+        """Run the matrix, save the winner for this host and return it (None if nothing encoded)."""
+        best = self.pick(self.run(matrix, progress_callback), max_size_ratio)
+        if not best:
+            return None
+        return self.save(best)
+
+    def save(self, best):
+        """Store a measured result as this host's profile."""
+        profile = {
+            'preset': best['preset'],
+            'crf': best['crf'],
+            'threads': best['threads'],
+            'tune': best['tune'],
+            'fps': round(best['fps'], 1),
+            'ssim': round(best['ssim'], 4),
+            # Output seconds encoded per wall-clock second
+            'realtime': round(self.clip_seconds / best['wall'], 2),
+            'bytes_per_sec': int(best['size'] / self.clip_seconds),
+            'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        save_profile(profile)
+        return profile
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from modules.processor import VideoProcessor
+
+    calibrator = EncoderCalibrator(VideoProcessor().ffmpeg)
+    results = calibrator.run(progress_callback=lambda pct, msg: print(f"\r{msg:<60}", end="", flush=True))
+    print()
+    print(f"{'Preset':<10} | {'CRF':<4} | {'Threads':<7} | {'Tune':<11} | {'FPS':>7} | {'Size KB':>8} | {'SSIM':>6}")
+    print("-" * 71)
+    for r in sorted(results, key=lambda r: -r['fps']):
+        print(f"{r['preset']:<10} | {r['crf']:<4} | {r['threads']:<7} | {str(r['tune']):<11} | {r['fps']:>7.1f} | {r['size'] // 1024:>8} | {r['ssim']:.4f}")
+
+    best = calibrator.pick(results)
+    if best:
+        profile = calibrator.save(best)
+        print(f"\nSaved for {host_id()}: {profile}")
+        print(f"Expected throughput: {parts_per_minute(profile, 60):.1f} parts/min at 60s parts")
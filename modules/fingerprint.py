@@ -0,0 +1,153 @@
+"""
+Perceptual fingerprints - spot the same clip behind a different URL.
+
+A fingerprint covers the opening FINGERPRINT_SECONDS of a source, so it can
+be taken from a cheap partial download. One decode yields both halves:
+
+- frames: a 64-bit difference hash (dHash) per second of video, from a 9x8
+  area-averaged gray frame. Flat frames (black intros, fades) hash to 0 and
+  are ignored.
+- chroma: a 12-bit code per second of audio; bit k says whether pitch class
+  k is stronger than k+1. Silence codes to 0 and is ignored.
+
+Both survive re-encoding, rescaling and volume changes. Lookups go through
+an LSH band index (each frame hash split into four 16-bit bands, so any two
+hashes within 3 bits share a band) and candidates are confirmed by
+aligning the sequences, allowing for a few seconds of trimmed intro.
+"""
+
+import os
+import tempfile
+
+from modules.sampler import FrameSampler, FrameConsumer
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+FINGERPRINT_SECONDS = 60    # Opening stretch a fingerprint covers
+AUDIO_RATE = 11025          # Mono PCM rate for chroma
+CHROMA_BAND = (55.0, 2000.0)  # Hz range folded into pitch classes
+FLAT_STD = 3.0              # Frames flatter than this (gray levels) carry no hash
+BANDS = 4                   # LSH bands per 64-bit frame hash
+MAX_SHIFT = 10              # Seconds of offset tried when aligning two fingerprints
+MIN_OVERLAP = 10            # Aligned seconds needed before anything counts
+FRAME_BITS = 10             # Hash distance still counted as the same frame
+CHROMA_BITS = 3             # Code distance still counted as the same second of audio
+FRAME_MATCH = 0.6           # Share of matching frames that makes a duplicate
+AUDIO_MATCH = 0.5           # ... confirmed by this share of matching audio (when both have audio)
+
+
+class FrameHasher(FrameConsumer):
+    """dHash of every frame (9x8 gray), 0 for flat frames."""
+    def start(self, sampler):
+        self.hashes = []
+        self._weights = (1 << np.arange(63, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+    def feed(self, frames, times):
+        bits = (frames[:, :, 1:] > frames[:, :, :-1]).reshape(len(frames), -1)
+        hashes = (bits.astype(np.uint64) * self._weights).sum(axis=1, dtype=np.uint64)
+        hashes[frames.reshape(len(frames), -1).std(axis=1) < FLAT_STD] = 0
+        self.hashes.extend(int(h) for h in hashes)
+
+
+def chroma_codes(pcm_path):
+    """12-bit chroma code per second of mono s16le PCM at AUDIO_RATE (0 for silence)."""
+    samples = np.fromfile(pcm_path, dtype=np.int16)
+    seconds = samples.size // AUDIO_RATE
+    if not seconds:
+        return []
+    blocks = samples[:seconds * AUDIO_RATE].astype(np.float32).reshape(seconds, AUDIO_RATE)
+    spectrum = np.abs(np.fft.rfft(blocks * np.hanning(AUDIO_RATE).astype(np.float32), axis=1))
+
+    freqs = np.fft.rfftfreq(AUDIO_RATE, 1.0 / AUDIO_RATE)
+    band = (freqs >= CHROMA_BAND[0]) & (freqs <= CHROMA_BAND[1])
+    # Pitch class of every bin (C = 0), folded with one matrix product
+    pitch = (np.round(12 * np.log2(freqs[band] / 440.0)).astype(int) + 9) % 12
+    fold = np.zeros((band.sum(), 12), dtype=np.float32)
+    fold[np.arange(band.sum()), pitch] = 1.0
+    chroma = spectrum[:, band] @ fold
+
+    bits = chroma > np.roll(chroma, -1, axis=1)
+    codes = (bits * (1 << np.arange(12))).sum(axis=1)
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1)) / 32768.0
+    codes[rms < 1e-3] = 0
+    return [int(c) for c in codes]
+
+
+class Fingerprinter:
+    def __init__(self, processor):
+        # Borrow the processor's FFmpeg and cancellable process tracking
+        self.processor = processor
+
+    def compute(self, path, seconds=FINGERPRINT_SECONDS):
+        """Fingerprint the opening of path. Returns {'frames', 'chroma'} or None."""
+        if not NUMPY_AVAILABLE:
+            return None
+        fd, audio_path = tempfile.mkstemp(prefix="ape-chroma-", suffix=".pcm")
+        os.close(fd)
+        sampler = FrameSampler(self.processor, 1, 9, 8, 'gray', scale_flags='area')
+        hasher = FrameHasher()
+        try:
+            ok = sampler.run(path, [hasher], length=seconds, extra_outputs=[
+                "-map", "0:a:0?", "-ac", "1", "-ar", str(AUDIO_RATE), "-f", "s16le", audio_path,
+            ])
+            chroma = chroma_codes(audio_path) if ok else []
+        finally:
+            try:
+                os.remove(audio_path)
+            except OSError:
+                pass
+        if not ok or not any(hasher.hashes):
+            return None
+        return {'frames': hasher.hashes, 'chroma': chroma}
+
+
+def band_keys(frames):
+    """LSH keys of a fingerprint's frame hashes: band number in the high bits, band value below."""
+    keys = set()
+    for h in frames:
+        if h:
+            for band in range(BANDS):
+                keys.add((band << 16) | ((h >> (16 * band)) & 0xFFFF))
+    return keys
+
+
+def _distances(a, b):
+    """Bit distance between equal-length uint64 arrays."""
+    return np.unpackbits((a ^ b).view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+def similarity(query, other):
+    """Best alignment of two fingerprints: (share of matching frames, share of matching audio or None)."""
+    fa = np.asarray(query['frames'], dtype=np.uint64)
+    fb = np.asarray(other['frames'], dtype=np.uint64)
+    ca = np.asarray(query.get('chroma') or [], dtype=np.int64)
+    cb = np.asarray(other.get('chroma') or [], dtype=np.int64)
+    best = (0.0, None)
+    for shift in range(-MAX_SHIFT, MAX_SHIFT + 1):
+        x, y = fa[max(shift, 0):], fb[max(-shift, 0):]
+        n = min(len(x), len(y))
+        valid = (x[:n] != 0) & (y[:n] != 0)
+        if valid.sum() < MIN_OVERLAP:
+            continue
+        frames = float((_distances(x[:n][valid], y[:n][valid]) <= FRAME_BITS).mean())
+        if frames <= best[0]:
+            continue
+
+        audio = None
+        x, y = ca[max(shift, 0):], cb[max(-shift, 0):]
+        n = min(len(x), len(y))
+        heard = (x[:n] != 0) & (y[:n] != 0)
+        if heard.sum() >= MIN_OVERLAP:
+            diff = (x[:n][heard] ^ y[:n][heard]).astype(np.uint16)
+            bits = np.unpackbits(diff.view(np.uint8)).reshape(-1, 16).sum(axis=1)
+            audio = float((bits <= CHROMA_BITS).mean())
+        best = (frames, audio)
+    return best
+
+
+def is_duplicate(frames, audio):
+    return frames >= FRAME_MATCH and (audio is None or audio >= AUDIO_MATCH)
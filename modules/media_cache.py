@@ -0,0 +1,178 @@
+import sqlite3
+import os
+import json
+import hashlib
+import datetime
+
+class MediaCache:
+    """ffprobe results and keyframe indexes, keyed by (path, size, mtime).
+
+    A row is only returned while the file on disk still has the size and
+    mtime it was probed with, so edited or replaced files re-probe on their own.
+    """
+
+    def __init__(self, db_path="media_cache.db"):
+        self.db_path = os.path.join(os.path.dirname(__file__), '..', db_path)
+        self._init_db()
+
+    def _connect(self):
+        # Parallel part workers share the cache, so wait on locks instead of failing
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        """Initialize the cache table if it doesn't exist."""
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS media_info
+                     (path TEXT PRIMARY KEY,
+                      size INTEGER,
+                      mtime REAL,
+                      fingerprint TEXT,
+                      probe TEXT,
+                      keyframes TEXT,
+                      date TEXT)''')
+        # Per-source analysis results (loudness, scene/silence curves, ...)
+        # keyed by content fingerprint so they follow the file, not its path
+        c.execute('''CREATE TABLE IF NOT EXISTS analysis
+                     (fingerprint TEXT,
+                      kind TEXT,
+                      data TEXT,
+                      date TEXT,
+                      PRIMARY KEY (fingerprint, kind))''')
+        conn.commit()
+        conn.close()
+
+    def _identity(self, path):
+        """Return (normalized path, size, mtime) or None if the file is missing."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime
+
+    def fingerprint(self, path, block=1 << 20):
+        """Content hash of size + first and last MB. Survives renames and moves."""
+        size = os.path.getsize(path)
+        h = hashlib.sha1(str(size).encode())
+        with open(path, 'rb') as f:
+            h.update(f.read(block))
+            if size > block:
+                f.seek(max(block, size - block))
+                h.update(f.read(block))
+        return h.hexdigest()
+
+    def _row(self, path):
+        ident = self._identity(path)
+        if not ident:
+            return None, None
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT size, mtime, fingerprint, probe, keyframes FROM media_info WHERE path=?", (ident[0],))
+            row = c.fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            return ident, None
+        # Stale entry: the file changed since it was probed
+        if row and (row[0] != ident[1] or row[1] != ident[2]):
+            return ident, None
+        return ident, row
+
+    def get_probe(self, path):
+        """Cached ffprobe JSON (format + streams) or None."""
+        _, row = self._row(path)
+        if row and row[3]:
+            return json.loads(row[3])
+        return None
+
+    def get_keyframes(self, path):
+        """Cached keyframe timestamps or None."""
+        _, row = self._row(path)
+        if row and row[4] is not None:
+            return json.loads(row[4])
+        return None
+
+    def get_fingerprint(self, path):
+        """Content fingerprint, computed once per file version."""
+        ident, row = self._row(path)
+        if row and row[2]:
+            return row[2]
+        if not ident:
+            return None
+        fp = self.fingerprint(path)
+        self._update(path, fingerprint=fp)
+        return fp
+
+    def put_probe(self, path, probe):
+        self._update(path, probe=json.dumps(probe))
+
+    def put_keyframes(self, path, keyframes):
+        self._update(path, keyframes=json.dumps(keyframes))
+
+    def get_analysis(self, path, kind):
+        """Cached analysis result of the given kind for this file's content, or None."""
+        fp = self.get_fingerprint(path)
+        if not fp:
+            return None
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT data FROM analysis WHERE fingerprint=? AND kind=?", (fp, kind))
+            row = c.fetchone()
+            conn.close()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            return None
+
+    def put_analysis(self, path, kind, data):
+        fp = self.get_fingerprint(path)
+        if not fp:
+            return False
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            c.execute("INSERT OR REPLACE INTO analysis (fingerprint, kind, data, date) VALUES (?, ?, ?, ?)",
+                      (fp, kind, json.dumps(data), date_str))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            return False
+
+    def _update(self, path, **fields):
+        """Write fields for the current file version, dropping anything stale."""
+        ident, row = self._row(path)
+        if not ident:
+            return False
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            date_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if row is None:
+                c.execute('''INSERT OR REPLACE INTO media_info
+                             (path, size, mtime, fingerprint, probe, keyframes, date)
+                             VALUES (?, ?, ?, NULL, NULL, NULL, ?)''',
+                          (ident[0], ident[1], ident[2], date_str))
+            for column, value in fields.items():
+                c.execute(f"UPDATE media_info SET {column}=?, date=? WHERE path=?", (value, date_str, ident[0]))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            return False
+
+    def purge_missing(self):
+        """Drop entries whose files no longer exist."""
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute("SELECT path FROM media_info")
+        gone = [(r[0],) for r in c.fetchall() if not os.path.exists(r[0])]
+        c.executemany("DELETE FROM media_info WHERE path=?", gone)
+        conn.commit()
+        conn.close()
+        return len(gone)
@@ -0,0 +1,141 @@
+"""
+MP4 integrity check - pure-Python box walk, no FFmpeg process per file.
+
+A finished part must parse as an ISO-BMFF file whose top-level boxes add up
+to the file size (a truncated write leaves mdat or moov running past EOF),
+carry a moov with a movie header, and hold non-empty video (and, when the
+source has it, audio) tracks. Only moov is read, so a check costs a few
+small reads regardless of the part's size.
+"""
+
+import os
+import struct
+
+# Top-level boxes every part we write must have
+REQUIRED_BOXES = (b'ftyp', b'moov', b'mdat')
+# Containers walked on the way to mvhd / hdlr / stsz
+CONTAINERS = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+
+
+class Mp4Error(ValueError):
+    pass
+
+
+def _boxes(data, offset=0, end=None):
+    """Yield (type, payload start, payload end) for the boxes in data[offset:end]."""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise Mp4Error(f"truncated {kind.decode('latin-1')} header")
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise Mp4Error(f"{kind.decode('latin-1')} box runs past its parent")
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _top_level(f, file_size):
+    """Walk the top-level boxes straight from the file. Returns {type: (payload offset, payload size)}."""
+    found = {}
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, kind = struct.unpack_from('>I4s', header)
+        header_len = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_len = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_len or offset + size > file_size:
+            raise Mp4Error(f"{kind.decode('latin-1')} box runs past end of file (truncated?)")
+        found.setdefault(kind, (offset + header_len, size - header_len))
+        offset += size
+    if offset != file_size:
+        raise Mp4Error("trailing bytes after last box")
+    return found
+
+
+def inspect(path):
+    """Parse path's structure. Returns {'duration', 'tracks': {handler: sample count}}."""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        top = _top_level(f, file_size)
+        for kind in REQUIRED_BOXES:
+            if kind not in top:
+                raise Mp4Error(f"no {kind.decode()} box")
+        offset, size = top[b'moov']
+        f.seek(offset)
+        moov = f.read(size)
+
+    duration = None
+    tracks = {}
+    for kind, start, end in _boxes(moov):
+        if kind == b'mvhd':
+            version = moov[start]
+            if version == 1:
+                timescale, length = struct.unpack_from('>IQ', moov, start + 20)
+            else:
+                timescale, length = struct.unpack_from('>II', moov, start + 12)
+            duration = length / timescale if timescale else 0.0
+        elif kind == b'trak':
+            handler, samples = _track(moov, start, end)
+            if handler:
+                tracks[handler] = tracks.get(handler, 0) + samples
+    if duration is None:
+        raise Mp4Error("no movie header")
+    return {'duration': duration, 'tracks': tracks}
+
+
+def _track(data, start, end):
+    """(handler type, sample count) of one trak box."""
+    handler = None
+    samples = 0
+    for kind, s, e in _boxes(data, start, end):
+        if kind == b'hdlr':
+            handler = data[s + 8:s + 12].decode('latin-1')
+        elif kind == b'stsz':
+            samples = struct.unpack_from('>I', data, s + 8)[0]
+        elif kind in CONTAINERS:
+            h, n = _track(data, s, e)
+            handler = handler or h
+            samples += n
+    return handler, samples
+
+
+def verify(path, expected=None, need_audio=True, tolerance=None):
+    """Return None if path is a complete part, else a short reason.
+
+    expected is the intended duration in seconds; tolerance defaults to the
+    larger of 1 s and 2% (stream-copied parts end on a packet, not a frame).
+    """
+    try:
+        info = inspect(path)
+    except (OSError, Mp4Error, struct.error) as e:
+        return f"unreadable: {e}"
+    if not info['tracks'].get('vide'):
+        return "no video samples"
+    if need_audio and not info['tracks'].get('soun'):
+        return "no audio samples"
+    if expected:
+        tolerance = tolerance if tolerance is not None else max(1.0, expected * 0.02)
+        if abs(info['duration'] - expected) > tolerance:
+            return f"duration {info['duration']:.1f}s, expected {expected:.1f}s"
+    return None
+
+
+def verify_batch(items, need_audio=True):
+    """Check many parts in one go. items: [(path, expected seconds)]. Returns {path: reason} for failures."""
+    failures = {}
+    for path, expected in items:
+        reason = verify(path, expected, need_audio)
+        if reason:
+            failures[path] = reason
+    return failures
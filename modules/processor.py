@@ -3,15 +3,144 @@ import math
 import subprocess
 import json
 import time
-import re
+import threading
+import bisect
+import collections
+import hashlib
+import shutil
+import tempfile
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from modules.media_cache import MediaCache
+from modules.encoder_profile import load_profile, EncoderCalibrator
+from modules.analysis import (SourceAnalyzer, plan_cuts, plan_highlights, plan_trims, plan_content_parts,
+                             loudnorm_filter, LOUDNESS_TARGET)
+from modules.smartcrop import SmartCropper, crop_keypoints
+from modules.render_cache import RenderCache
+from modules.supervisor import SUPERVISOR
+from modules.mp4check import verify_batch
+from modules.ratecontrol import (EncodeLog, RateModel, budget_bps, video_bps, PRIOR, MAX_CRF, PROBE_SAMPLES,
+                                 PROBE_SECONDS)
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
 
 # Direct FFmpeg Engine - Maximum Speed, Zero Fluff
 
+# Lines of FFmpeg stderr kept per process for error reporting
+STDERR_TAIL_LINES = 40
+# A streamed source may end this many output seconds before its listed duration
+STREAM_SLACK = 1.0
+
+# Extra outputs that can be rendered alongside the main part from the same
+# decode. size is the padded frame; crf/maxrate override the encoder profile.
+VARIANTS = {
+    'hd': {'size': (1080, 1920)},
+    'square': {'size': (1080, 1080)},
+    'preview': {'size': (360, 640), 'crf': 32, 'maxrate': '500k'},
+}
+
+# Cover images come off the same decode as the part: a pseudo-variant that
+# picks the most representative frame of a short window around the middle.
+COVER = 'cover'
+COVER_WIDTH = 360       # Cover image width (height follows the part's aspect)
+COVER_WINDOW = 5        # Seconds of candidate frames (sampled at 1 fps) per cover
+SHEET_COLUMNS = 5       # Covers per row on the contact sheet
+
+# Crop keypoints per FFmpeg command; longer spans (a single pass over a long
+# source) are thinned so the expression stays well inside command-line limits
+CROP_MAX_POINTS = 300
+
+@dataclass
+class ProgressEvent:
+    """Typed render progress. The GUI decides how to draw it.
+
+    kind: 'progress' (one part encoding), 'part_done', 'part_failed' or
+    'aggregate' (several parts encoding at once; done/active are filled in).
+    """
+    kind: str
+    part: int = 0
+    total: int = 0
+    pct: int = 0
+    eta: int = 0
+    out_time: float = 0.0
+    fps: float = 0.0
+    speed: float = 0.0
+    frame: int = 0
+    bitrate: float = 0.0
+    elapsed: float = 0.0
+    length: float = 0.0
+    done: int = 0
+    active: int = 0
+    # Source download progress while streaming (-1 when reading a finished file)
+    downloaded: int = -1
+
+    def __str__(self):
+        if self.kind == 'part_done':
+            return f"Part {self.part} Complete | 100% | {self.elapsed:.1f}s | Length: {self.length:.1f}s"
+        if self.kind == 'part_failed':
+            return f"Part {self.part} Failed"
+        if self.kind == 'aggregate':
+            return f"Parts {self.done}/{self.total} done | {self.active} rendering | {self.pct}% | ETA: {self.eta}s left"
+        dl = f" | DL {self.downloaded}%" if self.downloaded >= 0 else ""
+        return f"Part {self.part} | {self.pct}%{dl} | ETA: {self.eta}s left"
+
+class PartList(list):
+    """Finished main parts in order.
+
+    variants maps each extra variant name to its parts. covers lines up with
+    the parts (None where a part has no cover) and sheet is the contact sheet.
+    failed lists the parts that never passed the integrity check, as
+    {'part': number, 'path': intended output, 'reason': why}.
+    """
+    def __init__(self, paths=(), variants=None, covers=None, sheet=None, failed=None):
+        super().__init__(paths)
+        self.variants = variants or {}
+        self.covers = covers or []
+        self.sheet = sheet
+        self.failed = failed or []
+
+def default_workers():
+    """x264 ultrafast saturates ~4 cores, so run one part per 4 cores (of those encoders may use)."""
+    return max(1, SUPERVISOR.cpu_count() // 4)
+
 class VideoProcessor:
-    def __init__(self, output_dir="processed"):
+    def __init__(self, output_dir="processed", workers=None):
         self.output_dir = output_dir
+        self.workers = workers or default_workers()
+        # Max distance (seconds) a cut may move to land on a source keyframe
+        self.snap_tolerance = 2.0
+        # How far (seconds) smart cuts may move a boundary to find silence or a scene change
+        self.cut_window = 5.0
+        # Parts at least twice this long (output seconds) are encoded as concurrent chunks
+        self.chunk_seconds = 60.0
         self.last_error = None
+        # Why each part's own FFmpeg run failed, by part number (last_error is shared by parallel parts)
+        self.part_errors = {}
+        # Part numbers planned as a stream copy that were re-encoded instead
+        self.copy_fallbacks = set()
         self.cancelled = False
+        # Download progress of the source being streamed in (-1 when not streaming)
+        self.ingest_pct = -1
+        # Output seconds the last FFmpeg run got to
+        self.out_time = 0.0
+        # Audio normalisation filter for the source being segmented (None = off)
+        self.loudnorm = None
+        # Smart crop plan for the source being segmented (None = fit and pad)
+        self.crop_track = None
+        # Size cap (bytes) for each main part of the source being segmented (None = CRF only)
+        self.size_cap = None
+        self.rate_model = RateModel()
+        self.encode_log = EncodeLog()
+        self.cache = MediaCache()
+        self.renders = RenderCache()
+        # Rendered parts kept for reuse before the least recently used are deleted
+        self.render_cache_bytes = 20 * 1024**3
+        # Per-host x264 settings from the calibration run (defaults until calibrated)
+        self.encoder = load_profile()
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             
@@ -22,132 +151,1236 @@ class VideoProcessor:
 
     def cancel(self):
         self.cancelled = True
+        # Reach every in-flight child, not just the one being monitored.
+        # Stragglers are killed after a grace period without blocking the caller.
+        SUPERVISOR.stop(owner=self, wait=False)
 
-    def _get_video_info(self, path):
-        """Get duration and dimensions instantly via ffprobe."""
+    def _spawn(self, cmd, **kwargs):
+        """Start a hidden, priority-limited child process that cancel() can reach."""
+        return SUPERVISOR.spawn(cmd, owner=self, **kwargs)
+
+    def _release(self, process):
+        SUPERVISOR.release(process)
+
+    def _probe(self, path):
+        """Full format + stream description, from the cache or one ffprobe call."""
+        probe = self.cache.get_probe(path)
+        if probe is not None:
+            return probe
         try:
             cmd = [
                 self.ffprobe, 
                 "-v", "error", 
-                "-show_entries", "format=duration", 
-                "-show_entries", "stream=width,height", 
+                "-show_format", 
+                "-show_streams", 
                 "-of", "json", 
                 path
             ]
             
-            # Hide window
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            _, out, _ = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            probe = json.loads(out)
+            if 'format' not in probe:
+                return None
+            self.cache.put_probe(path, probe)
+            return probe
+        except:
+            return None
 
-            result = subprocess.run(cmd, capture_output=True, text=True, startupinfo=startupinfo)
-            data = json.loads(result.stdout)
-            
+    def _video_stream(self, probe):
+        """First real video stream (skips cover art), or None."""
+        for stream in probe.get('streams', []):
+            if stream.get('codec_type') == 'video' and not stream.get('disposition', {}).get('attached_pic'):
+                return stream
+        return None
+
+    def _has_audio(self, path):
+        return any(s.get('codec_type') == 'audio' for s in (self._probe(path) or {}).get('streams', []))
+
+    def _get_video_info(self, path):
+        """Get duration and dimensions (cached ffprobe)."""
+        try:
+            data = self._probe(path)
             duration = float(data['format']['duration'])
-            width = int(data['streams'][0]['width'])
-            height = int(data['streams'][0]['height'])
+            stream = self._video_stream(data)
+            width = int(stream['width'])
+            height = int(stream['height'])
             
             return duration, width, height
         except:
             return 0, 0, 0
 
-    def _parse_time(self, time_str):
-        """Convert HH:MM:SS.mm to seconds."""
+    def _get_keyframes(self, path):
+        """List video keyframe timestamps by scanning packet flags (demux only, no decode)."""
+        keyframes = self.cache.get_keyframes(path)
+        if keyframes is not None:
+            return keyframes
         try:
-            parts = time_str.split(':')
-            return int(parts[0])*3600 + int(parts[1])*60 + float(parts[2])
+            cmd = [
+                self.ffprobe,
+                "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,flags",
+                "-of", "csv=p=0",
+                path
+            ]
+            
+            returncode, out, _ = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            keyframes = []
+            for line in out.splitlines():
+                fields = line.split(',')
+                if len(fields) >= 2 and 'K' in fields[1] and fields[0] not in ('', 'N/A'):
+                    keyframes.append(float(fields[0]))
+            keyframes.sort()
+            if returncode == 0:
+                self.cache.put_keyframes(path, keyframes)
+            return keyframes
         except:
-            return 0.0
-
-    def _monitor_ffmpeg(self, cmd, part_num, total_parts, duration, report):
-        """Run FFmpeg and parse stderr for real-time progress."""
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            text=True, 
-            startupinfo=startupinfo
-        )
+            return []
+
+    def _read_progress(self, stream):
+        """Yield one typed sample per -progress block (key=value lines closed by progress=...)."""
+        block = {}
+        for raw in stream:
+            key, sep, value = raw.decode('utf-8', 'replace').strip().partition('=')
+            if not sep:
+                continue
+            block[key] = value.strip()
+            if key == 'progress':
+                yield self._parse_progress(block)
+                block = {}
+
+    def _parse_progress(self, block):
+        """Convert a raw -progress block into seconds, fps, speed, frame and kbit/s."""
+        def num(key, suffix=""):
+            try:
+                return float(block.get(key, "").replace(suffix, "") or 0)
+            except ValueError:
+                return 0.0
+        
+        # out_time_us is the accurate one (out_time_ms is also microseconds, for legacy reasons)
+        out_us = num('out_time_us') or num('out_time_ms')
+        return {
+            'out_time': max(out_us / 1_000_000, 0.0),
+            'fps': num('fps'),
+            'speed': num('speed', 'x'),
+            'frame': int(num('frame')),
+            'bitrate': num('bitrate', 'kbits/s'),
+            'end': block.get('progress') == 'end',
+        }
+
+    def _monitor_ffmpeg(self, cmd, part_num, total_parts, duration, report, part_ends=None, on_progress=None, feed=None):
+        """Run FFmpeg and follow its machine-readable -progress channel.
+
+        Progress arrives as key=value blocks on stdout and is reported as
+        ProgressEvent objects. stderr is kept as a bounded tail so a failure
+        leaves FFmpeg's own error text in last_error.
+
+        With part_ends (cumulative output-time boundaries) a single process
+        writes every part, so the current part is derived from the timestamp.
+        With on_progress the raw fraction is handed to the caller instead of
+        a per-part event (used when several parts render at once).
+        With feed, FFmpeg reads its input from stdin and feed(stdin) runs on a
+        side thread to supply it.
+        """
+        cmd = [cmd[0], "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"] + cmd[1:]
+        process = self._spawn(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              stdin=subprocess.PIPE if feed else subprocess.DEVNULL)
+        if feed:
+            threading.Thread(target=feed, args=(process.stdin,), daemon=True).start()
         
-        # Regex for time=00:00:00.00
-        time_pattern = re.compile(r"time=(\d{2}:\d{2}:\d{2}\.\d{2})")
+        # Drain stderr on the side so it can never fill up and stall FFmpeg
+        stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        def drain():
+            for raw in process.stderr:
+                stderr_tail.append(raw.decode('utf-8', 'replace').rstrip())
+        drainer = threading.Thread(target=drain, daemon=True)
+        drainer.start()
+        
+        try:
+            success = self._watch_ffmpeg(process, part_num, total_parts, duration, report, part_ends, on_progress)
+        finally:
+            self._release(process)
         
+        drainer.join(timeout=2)
+        if not success and not self.cancelled:
+            self.last_error = "\n".join(stderr_tail) or f"FFmpeg exited with code {process.returncode}"
+            if not part_ends:
+                self.part_errors[part_num] = self.last_error
+        return success
+
+    def _watch_ffmpeg(self, process, part_num, total_parts, duration, report, part_ends, on_progress):
         start_real = time.time()
         last_report = 0
+        part_start = 0.0
+        part_real = start_real
+        # Output time reached, for callers that need to know how far a run got
+        self.out_time = 0.0
         
-        # Colors (HTML)
-        C_WHITE = "#FFFFFF"
-        C_DIM = "#888888"
-        C_ACCENT = "#0078D4"
-        C_GREEN = "#107C10"
-        
-        while True:
+        # Blocking reads: cancel() terminates the process, which closes the pipe
+        for sample in self._read_progress(process.stdout):
             # Check if user cancelled
             if self.cancelled:
                 process.terminate()
-                return False
-                
-            # Read stderr line-by-line (FFmpeg writes progress to stderr)
-            line = process.stderr.readline()
-            if not line and process.poll() is not None:
                 break
-                
-            if not line:
+            
+            current_pts = sample['out_time']
+            self.out_time = max(self.out_time, current_pts)
+            now = time.time()
+            
+            # Single pass: close out every part the encoder has moved past
+            if part_ends:
+                while part_num < total_parts and current_pts >= part_ends[part_num - 1]:
+                    report(None, ProgressEvent('part_done', part_num, total_parts, pct=100,
+                                               elapsed=now - part_real, length=part_ends[part_num - 1] - part_start))
+                    report(int(10 + (part_num / total_parts) * 90), None)
+                    part_start = part_ends[part_num - 1]
+                    part_real = now
+                    part_num += 1
+            
+            if on_progress:
+                on_progress(part_num, min(current_pts / duration, 1.0) if duration > 0 else 0.0)
                 continue
+            
+            # Throttle updates (max 20 per second for smooth visuals)
+            if now - last_report > 0.05 or sample['end']:
+                part_len = (part_ends[part_num - 1] - part_start) if part_ends else duration
+                part_pts = current_pts - part_start
+                pct = min(int((part_pts / part_len) * 100), 100) if part_len > 0 else 0
                 
-            # Parse progress
-            match = time_pattern.search(line)
-            if match:
-                current_pts = self._parse_time(match.group(1))
-                now = time.time()
+                # Calculate ETA
+                elapsed = now - start_real
+                if current_pts > 0:
+                    rate = elapsed / current_pts
+                    remaining = duration - current_pts
+                    eta = int(remaining * rate)
+                else:
+                    eta = 0
                 
-                # Throttle updates (max 20 per second for smooth visuals)
-                if now - last_report > 0.05:
-                    pct = min(int((current_pts / duration) * 100), 100)
-                    
-                    # Calculate ETA
-                    elapsed = now - start_real
-                    if current_pts > 0:
-                        rate = elapsed / current_pts
-                        remaining = duration - current_pts
-                        eta = int(remaining * rate)
-                    else:
-                        eta = 0
-                    
-                    # Format: Part 1 | 32% | ETA: 12s left
-                    # HTML Color Coding
-                    msg = (
-                        f"<span style='color:{C_WHITE}'>Part {part_num}</span> "
-                        f"<span style='color:{C_DIM}'>|</span> "
-                        f"<span style='color:{C_ACCENT}'>{pct}%</span> "
-                        f"<span style='color:{C_DIM}'>|</span> "
-                        f"<span style='color:{C_DIM}'>ETA: {eta}s left</span>"
+                report(None, ProgressEvent(
+                    'progress', part_num, total_parts, pct=pct, eta=eta, out_time=current_pts,
+                    fps=sample['fps'], speed=sample['speed'], frame=sample['frame'],
+                    bitrate=sample['bitrate'], elapsed=elapsed, length=part_len,
+                    downloaded=self.ingest_pct
+                ))
+                last_report = now
+        
+        if self.cancelled:
+            process.terminate()
+        success = process.wait() == 0 and not self.cancelled
+        if success and part_ends:
+            report(None, ProgressEvent('part_done', part_num, total_parts, pct=100,
+                                       elapsed=time.time() - part_real, length=part_ends[part_num - 1] - part_start))
+        return success
+
+    def output_frames(self, crop_vertical, variants=(), smart_crop=False):
+        """Frames the source has to fill for these settings, as (width, height, cropped).
+
+        cropped frames come from a full-height 9:16 window (smart crop), so
+        they need the source's full height; the others are fit and pad.
+        None when the main part keeps the source frame (no crop_vertical),
+        so no source is bigger than needed.
+        """
+        if not crop_vertical:
+            return None
+        sizes = [(720, 1280)] + [VARIANTS[name]['size'] for name in variants]
+        return [(w, h, smart_crop and w * 16 == h * 9) for w, h in sizes]
+
+    def _fit(self, width, height):
+        return f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black"
+
+    def _frame(self, width, height, window, speed_up, keep=None):
+        """Filters bringing the source to width x height: the smart crop for 9:16 outputs when
+        there is a crop plan, otherwise fit and pad."""
+        if self.crop_track and window and width * 16 == height * 9:
+            x = self._crop_x(window, 1.25 if speed_up else 1.0, keep)
+            return [f"crop={self.crop_track['width']}:ih:'{x}':0", f"scale={width}:{height}"]
+        return [self._fit(width, height)]
+
+    def _crop_x(self, window, speed, keep=None):
+        """Crop x expression for a command whose input starts window[0] seconds into the source.
+
+        The keypoints are joined by straight pans: the left edge starts at the
+        first keypoint's x and each ramp adds its slope for as long as t is
+        inside it, so FFmpeg evaluates a short sum per frame. t is the
+        command's own timeline (seeked to 0, trimmed to the keep spans, then
+        sped up), so a join between kept spans is a jump.
+        """
+        points = self.crop_track['points']
+        times = [t for t, _ in points]
+        start, length = window
+        
+        def x_at(t):
+            i = bisect.bisect_right(times, t)
+            if i == 0 or i == len(points):
+                return points[min(i, len(points) - 1)][1]
+            (t1, x1), (t2, x2) = points[i - 1], points[i]
+            return x1 + (x2 - x1) * (t - t1) / (t2 - t1)
+        
+        # Keypoints moved onto the output timeline, one run per kept span
+        path = []
+        clock = 0.0
+        for offset, span in keep or [(0.0, length)]:
+            a, b = start + offset, start + offset + span
+            inner = points[bisect.bisect_right(times, a):bisect.bisect_left(times, b)]
+            for t, x in [(a, x_at(a))] + inner + [(b, x_at(b))]:
+                path.append(((clock + t - a) / speed, x))
+            clock += span
+        if len(path) > CROP_MAX_POINTS:
+            stride = -(-len(path) // CROP_MAX_POINTS)
+            path = path[:-1:stride] + path[-1:]
+        
+        expr = str(int(round(path[0][1])))
+        for (t1, x1), (t2, x2) in zip(path, path[1:]):
+            dx = x2 - x1
+            if abs(dx) < 0.5:
+                continue
+            sign = '+' if dx > 0 else '-'
+            if t2 - t1 < 0.01:
+                expr += f"{sign}gte(t,{t1:.2f})*{abs(dx):.0f}"
+                continue
+            ramp = t2 - t1
+            expr += f"{sign}clip(t-{t1:.2f},0,{ramp:.2f})*{abs(dx) / ramp:.3f}"
+        return expr
+
+    def _cover_windows(self, spans):
+        """Cover pick windows for (start, length) spans on the output timeline.
+
+        Returns (window starts, window seconds). Windows sit on each span's
+        middle and are never wider than half the shortest span, so each
+        holds exactly that many 1 fps frames and yields one cover.
+        """
+        width = max(1, min(COVER_WINDOW, int(min(length for _, length in spans) / 2)))
+        return [max(start, start + length / 2 - width / 2) for start, length in spans], width
+
+    def _cover_chain(self, crop_vertical, cover, window=None, speed_up=False, keep=None):
+        """Filters turning decoded frames into covers: thin out, pick, then scale the picks only."""
+        windows, width = cover
+        picks = "+".join(f"gte(t,{a:.3f})*lt(t,{a + width:.3f})" for a in windows)
+        chain = ["fps=1", f"select='{picks}'", f"thumbnail={width}"]
+        if crop_vertical:
+            chain.extend(self._frame(COVER_WIDTH, COVER_WIDTH * 16 // 9, window, speed_up, keep))
+        else:
+            chain.append(f"scale={COVER_WIDTH}:-2")
+        return chain
+
+    def _audio_filters(self, speed_up):
+        audio = []
+        if speed_up:
+            # atempo=1.25 (Speed Audio + Pitch Correct)
+            audio.append("atempo=1.25")
+        # Loudness: one gain measured on the whole source, shared by every part
+        if self.loudnorm:
+            audio.append(self.loudnorm)
+        return audio
+
+    def _graph(self, crop_vertical, speed_up, variants=(), cover=None, with_audio=True, window=None, keep=None):
+        """Build the filter graph and the stream maps of each output.
+
+        Returns (args, maps) where maps[None] is the main output and
+        maps[name] each extra variant. With variants, the speed-up runs once
+        and a split feeds every output's own scale/pad. cover (from
+        _cover_windows) adds a video-only COVER output. with_audio=False
+        leaves audio out of the graph and the maps entirely. window is the
+        (start, length) of source the command reads, for the smart crop.
+        keep lists the (offset, length) spans of the input that make up the
+        part; they are trimmed out and joined before anything else, so
+        dead air costs no extra pass. The input must have audio unless
+        with_audio is False.
+        """
+        video = []
+        audio = self._audio_filters(speed_up) if with_audio else []
+        graph = []
+        source_v, source_a = "[0:v]", "[0:a]"
+        if keep:
+            # 0. Trim: cut every kept span out of the input and lay them end to end
+            n = len(keep)
+            audio = (audio or ["anull"]) if with_audio else []
+            graph.append(f"[0:v]split={n}" + "".join(f"[k{j}]" for j in range(n)))
+            if audio:
+                graph.append(f"[0:a]asplit={n}" + "".join(f"[l{j}]" for j in range(n)))
+            for j, (offset, length) in enumerate(keep):
+                span = f"start={offset:.3f}:end={offset + length:.3f}"
+                graph.append(f"[k{j}]trim={span},setpts=PTS-STARTPTS[tv{j}]")
+                if audio:
+                    graph.append(f"[l{j}]atrim={span},asetpts=PTS-STARTPTS[ta{j}]")
+            inputs = "".join(f"[tv{j}]" + (f"[ta{j}]" if audio else "") for j in range(n))
+            graph.append(f"{inputs}concat=n={n}:v=1:a={1 if audio else 0}[cv]" + ("[ca]" if audio else ""))
+            source_v, source_a = "[cv]", "[ca]"
+        
+        # 1. Speed Filter (Must trigger first to affect timestamps)
+        if speed_up:
+            # setpts=PTS/1.25 (Speed Visuals)
+            video.append("setpts=PTS/1.25")
+        
+        # 2. Crop/Scale Filter, per output
+        outputs = [(None, "v", "a", self._frame(720, 1280, window, speed_up, keep) if crop_vertical else [])]
+        for name in variants:
+            outputs.append((name, f"v_{name}", f"a_{name}", self._frame(*VARIANTS[name]['size'], window, speed_up, keep)))
+        if cover:
+            outputs.append((COVER, "v_cover", None, self._cover_chain(crop_vertical, cover, window, speed_up, keep)))
+        
+        maps = {name: [] for name, _, _, _ in outputs}
+        if len(outputs) == 1:
+            video.extend(outputs[0][3])
+            if video:
+                graph.append(f"{source_v}{','.join(video)}[v]")
+                maps[None].extend(["-map", "[v]"])
+            elif keep:
+                maps[None].extend(["-map", source_v])
+            else:
+                maps[None].extend(["-map", "0:v:0"])
+        else:
+            # Unfiltered branches take their final label straight off the split
+            heads = [f"[{v}]" if not chain else f"[s{j}]" for j, (_, v, _, chain) in enumerate(outputs)]
+            graph.append(f"{source_v}{','.join(video + [f'split={len(outputs)}'])}{''.join(heads)}")
+            for j, (name, v, _, chain) in enumerate(outputs):
+                if chain:
+                    graph.append(f"{heads[j]}{','.join(chain)}[{v}]")
+                maps[name].extend(["-map", f"[{v}]"])
+        
+        audible = [(name, a) for name, _, a, _ in outputs if a and with_audio]
+        if audio:
+            if len(audible) > 1:
+                audio.append(f"asplit={len(audible)}")
+            graph.append(f"{source_a}{','.join(audio)}{''.join(f'[{a}]' for _, a in audible)}")
+            for name, a in audible:
+                maps[name].extend(["-map", f"[{a}]"])
+        else:
+            # Input streams can be mapped into any number of outputs
+            for name, _ in audible:
+                maps[name].extend(["-map", "0:a:0?"])
+        
+        args = ["-filter_complex", ";".join(graph)] if graph else []
+        return args, maps
+
+    def _filter_args(self, crop_vertical, speed_up, window=None, keep=None):
+        """Build the filter graph and stream maps shared by every render mode."""
+        args, maps = self._graph(crop_vertical, speed_up, window=window, keep=keep)
+        return args + maps[None]
+
+    def _output_args(self, temp_path, crop_vertical, speed_up, threads=None, variants=(), cover=None, with_audio=True,
+                     window=None, keep=None, crf=None):
+        """Filter graph plus every output (main part first) with its encoder settings.
+
+        crf overrides the profile's CRF for the main part only.
+        """
+        args, maps = self._graph(crop_vertical, speed_up, variants, cover, with_audio, window, keep)
+        args = args + maps[None] + self._encoder_args(threads, crf=crf) + [temp_path]
+        for name in variants:
+            args += maps[name] + self._encoder_args(threads, VARIANTS[name]) + [self._variant_path(temp_path, name)]
+        if cover:
+            args += maps[COVER] + ["-frames:v", "1", "-q:v", "3", "-update", "1", self._variant_path(temp_path, COVER)]
+        return args
+
+    def _encoder_args(self, threads=None, variant=None, crf=None):
+        """Encoding Settings (from the host's encoder profile).
+
+        threads overrides the profile when parts share the CPU in parallel mode.
+        variant is a VARIANTS entry whose crf/maxrate override the profile.
+        crf (a size-targeted part) overrides both.
+        """
+        variant = variant or {}
+        args = [
+            "-c:v", "libx264", 
+            "-preset", self.encoder['preset'], 
+            "-crf", str(crf if crf is not None else variant.get('crf', self.encoder['crf'])),
+            "-c:a", "aac", 
+        ]
+        if variant.get('maxrate'):
+            bufsize = f"{int(variant['maxrate'].rstrip('k')) * 2}k"
+            args.extend(["-maxrate", variant['maxrate'], "-bufsize", bufsize])
+        if self.encoder.get('tune'):
+            args.extend(["-tune", self.encoder['tune']])
+        threads = threads or self.encoder.get('threads')
+        if threads:
+            args.extend(["-threads", str(threads)])
+        return args
+
+    def calibrate_encoder(self, progress_callback=None):
+        """Benchmark x264 settings on this host, save and switch to the winner."""
+        profile = EncoderCalibrator(self.ffmpeg).calibrate(progress_callback=progress_callback)
+        if profile:
+            self.encoder = load_profile()
+        return profile
+
+    def _plan_parts(self, duration, segment_duration, speed_up):
+        """Split the source into (start, length) chunks on the ORIGINAL timeline."""
+        # If we speed up, we need to grab 1.25x more content to fill the same slot
+        chunk_len_src = segment_duration * 1.25 if speed_up else segment_duration
+        parts = []
+        start = 0.0
+        while start < duration:
+            length = min(chunk_len_src, duration - start)
+            parts.append((start, length))
+            start += chunk_len_src
+        # Fold a sub-second tail into the previous part instead of dropping it
+        if len(parts) > 1 and parts[-1][1] < 1.0:
+            tail = parts.pop()
+            parts[-1] = (parts[-1][0], parts[-1][1] + tail[1])
+        return parts
+
+    def _snap_parts(self, parts, keyframes):
+        """Move each cut onto the nearest source keyframe within snap_tolerance.
+
+        Returns (start, length, copy) tuples. copy is False for a part whose
+        start could not be snapped, since a stream copy would begin at the
+        previous keyframe and repeat content from the part before it.
+        """
+        if not parts:
+            return []
+        end = parts[-1][0] + parts[-1][1]
+        starts = [(0.0, True)]
+        for start, _ in parts[1:]:
+            idx = bisect.bisect_left(keyframes, start)
+            nearest = [keyframes[j] for j in (idx - 1, idx) if 0 <= j < len(keyframes)]
+            best = min(nearest, key=lambda k: abs(k - start)) if nearest else None
+            if best is not None and abs(best - start) <= self.snap_tolerance and best > starts[-1][0]:
+                starts.append((best, True))
+            else:
+                starts.append((start, False))
+        
+        snapped = []
+        for j, (start, copy) in enumerate(starts):
+            stop = starts[j + 1][0] if j + 1 < len(starts) else end
+            snapped.append((start, stop - start, copy))
+        return snapped
+
+    def _render_part(self, input_path, output_path, part_num, total_parts, start_time_src, current_len_src,
+                     crop_vertical, speed_up, report, threads=None, on_progress=None, copy=False, variants=(),
+                     covers=False, keep=None):
+        """Render one part with its own FFmpeg process. Returns (success, seconds taken).
+
+        Extra variants (and the cover, when re-encoding) are written next to
+        output_path by the same process. Outputs are left under their
+        .partial names for _verify_parts to promote. keep (offset, length)
+        spans trim dead air out of the source span in the same encode.
+        """
+        # Length of the finished part on the OUTPUT timeline
+        content_len = sum(length for _, length in keep) if keep else current_len_src
+        current_part_len = content_len / 1.25 if speed_up else content_len
+        part_start = time.time()
+        
+        # Write under a temporary name; only a finished file gets the real one
+        temp_path = self._partial_path(output_path)
+        
+        success = False
+        if copy:
+            self.copy_fallbacks.discard(part_num)
+            # Remux on keyframe boundaries. Nudge the seek past the keyframe
+            # timestamp so float rounding can't land on the GOP before it.
+            cmd = [self.ffmpeg, "-y", "-ss", f"{start_time_src + 0.001:.3f}", "-t", f"{current_len_src:.3f}", "-i", input_path]
+            cmd.extend(["-map", "0:v:0", "-map", "0:a:0?", "-c", "copy"])
+            if self.loudnorm:
+                # Video stays a remux; only the (cheap) audio is re-encoded
+                cmd.extend(["-af", self.loudnorm, "-c:a", "aac"])
+            cmd.extend(["-avoid_negative_ts", "make_zero", temp_path])
+            success = self._monitor_ffmpeg(cmd, part_num, total_parts, current_part_len, report, on_progress=on_progress)
+            if not success and not self.cancelled:
+                report(None, f"Part {part_num} Copy failed - Re-encoding")
+                self.copy_fallbacks.add(part_num)
+        
+        if not success and not self.cancelled:
+            # BUILD COMMAND
+            cover = self._cover_windows([(0.0, current_part_len)]) if covers else None
+            # A trimmed part is one graph: its spans don't split into chunks
+            chunks = [] if keep else self._plan_chunks(input_path, start_time_src, current_len_src, speed_up, threads)
+            
+            def encode(crf=None):
+                if len(chunks) > 1:
+                    return self._render_chunked(
+                        input_path, temp_path, part_num, total_parts, chunks, crop_vertical, speed_up,
+                        report, threads, on_progress, variants, cover, crf
                     )
-                    
-                    report(None, msg)
-                    last_report = now
+                cmd = [self.ffmpeg, "-y", "-ss", str(start_time_src), "-t", str(current_len_src), "-i", input_path]
+                cmd.extend(self._output_args(temp_path, crop_vertical, speed_up, threads, variants, cover,
+                                             self._has_audio(input_path),
+                                             (start_time_src, current_len_src), keep, crf))
+                
+                # Execute with Real-Time Monitoring
+                return self._monitor_ffmpeg(cmd, part_num, total_parts, current_part_len, report, on_progress=on_progress)
+            
+            # Size cap: encode at the CRF predicted to land under it, first time
+            plan = None
+            if self.size_cap:
+                plan = self._size_plan(input_path, start_time_src, current_len_src, keep, crop_vertical, speed_up,
+                                       current_part_len, threads)
+                if plan is None and not self.cancelled:
+                    report(None, f"Part {part_num}: complexity probe failed - encoding at the profile CRF")
+            success = encode(plan['crf'] if plan else None)
+            if success and plan:
+                success = self._check_size(plan, temp_path, encode, part_num, report)
+        
+        if not success:
+            self._discard_part(output_path, variants)
+        
+        dt = time.time() - part_start
+        if success:
+            report(None, ProgressEvent('part_done', part_num, total_parts, pct=100, elapsed=dt, length=current_part_len))
+        elif not self.cancelled:
+            report(None, ProgressEvent('part_failed', part_num, total_parts))
+        return success, dt
+
+    def _probe_complexity(self, input_path, start, length, keep, crop_vertical, speed_up, threads=None):
+        """Video bits per output second of a few short samples of a part, at the profile CRF.
+
+        The samples are spread over the part's content, joined, and sent
+        through the part's speed-up and framing (a fixed centre crop stands
+        in for the smart crop). Returns None if the probe encode fails.
+        """
+        spans = keep or [(0.0, length)]
+        content = sum(span for _, span in spans)
+        sample = min(PROBE_SECONDS, content / PROBE_SAMPLES)
+        cmd = [self.ffmpeg, "-y", "-hide_banner", "-loglevel", "error"]
+        for k in range(PROBE_SAMPLES):
+            # Centre of the k-th slice of the content, back on the source timeline
+            at = content * (2 * k + 1) / (2 * PROBE_SAMPLES) - sample / 2
+            for offset, span in spans:
+                if at < span:
+                    break
+                at -= span
+            at = start + offset + max(0.0, min(at, span - sample))
+            cmd.extend(["-ss", f"{at:.3f}", "-t", f"{sample:.3f}", "-i", input_path])
+        
+        chain = [f"concat=n={PROBE_SAMPLES}:v=1:a=0"]
+        if speed_up:
+            chain.append("setpts=PTS/1.25")
+        if crop_vertical and self.crop_track:
+            chain.extend([f"crop={self.crop_track['width']}:ih", "scale=720:1280"])
+        elif crop_vertical:
+            chain.append(self._fit(720, 1280))
+        inputs = "".join(f"[{k}:v:0]" for k in range(PROBE_SAMPLES))
+        
+        fd, probe_path = tempfile.mkstemp(prefix=".probe-", suffix=".mp4", dir=self.output_dir)
+        os.close(fd)
+        try:
+            cmd.extend(["-filter_complex", f"{inputs}{','.join(chain)}[v]", "-map", "[v]", "-an"])
+            cmd.extend(self._encoder_args(threads) + [probe_path])
+            returncode, _, _ = SUPERVISOR.run(cmd, owner=self, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            size = os.path.getsize(probe_path)
+            if returncode != 0 or not size:
+                return None
+            return size * 8 / (PROBE_SAMPLES * sample / (1.25 if speed_up else 1.0))
+        except OSError:
+            return None
+        finally:
+            self._discard(probe_path)
+
+    def _size_plan(self, input_path, start, length, keep, crop_vertical, speed_up, out_len, threads=None):
+        """Probe a part and predict the CRF that keeps it under size_cap. Returns the plan or None."""
+        probe_bps = self._probe_complexity(input_path, start, length, keep, crop_vertical, speed_up, threads)
+        if not probe_bps:
+            return None
+        audio = self._has_audio(input_path)
+        target = budget_bps(self.size_cap, out_len, audio)
+        return {
+            'probe_bps': probe_bps,
+            'probe_crf': self.encoder['crf'],
+            'crf': self.rate_model.crf_for(probe_bps, self.encoder['crf'], target),
+            'seconds': out_len,
+            'audio': audio,
+            'target': target,
+        }
+
+    def _check_size(self, plan, temp_path, encode, part_num, report):
+        """Log a sized encode; re-encode it once, correcting the CRF from the miss, if it went over the cap.
+
+        Returns whether the part rendered.
+        """
+        size = os.path.getsize(temp_path)
+        self.encode_log.add(self.encoder, plan, size, self.size_cap)
+        if size <= self.size_cap or self.cancelled:
+            return True
+        
+        # Step by the rule-of-thumb slope (the miss says the fit is off here), plus a little headroom
+        miss = math.log(video_bps(size, plan['seconds'], plan['audio']) / plan['target'])
+        retry = dict(plan, crf=round(min(plan['crf'] + miss / -PRIOR[1] + 0.5, MAX_CRF), 1))
+        if retry['crf'] <= plan['crf']:
+            report(None, f"Part {part_num} over the size cap ({size / 2**20:.1f} MB) even at CRF {plan['crf']}")
+            return True
+        report(None, f"Part {part_num} over the size cap ({size / 2**20:.1f} MB at CRF {plan['crf']}) "
+                     f"- Re-encoding at CRF {retry['crf']}")
+        if not encode(retry['crf']):
+            return False
+        size = os.path.getsize(temp_path)
+        self.encode_log.add(self.encoder, retry, size, self.size_cap, attempt=2)
+        if size > self.size_cap:
+            report(None, f"Part {part_num} still over the size cap ({size / 2**20:.1f} MB)")
+        return True
+
+    def _plan_chunks(self, input_path, start, length, speed_up, threads=None):
+        """Split a long part into GOP-aligned (start, length) sub-chunks on the source timeline.
+
+        Each chunk encoder gets ~4 threads out of the part's budget, so a part
+        is only split when it is long enough (chunk_seconds per chunk) and
+        the budget can feed at least two encoders. Returns [(start, length)]
+        unchanged otherwise.
+        """
+        budget = threads or self.encoder.get('threads') or SUPERVISOR.cpu_count()
+        out_len = length / 1.25 if speed_up else length
+        count = min(budget // 4, int(out_len // self.chunk_seconds))
+        if count < 2:
+            return [(start, length)]
+        
+        # Start each chunk on a keyframe: the seek lands there without decoding a
+        # lead-in, and every chunk begins with a clean GOP of its own
+        keyframes = self._get_keyframes(input_path)
+        step = length / count
+        starts = [start]
+        for k in range(1, count):
+            target = start + k * step
+            idx = bisect.bisect_left(keyframes, target)
+            near = [keyframes[j] for j in (idx - 1, idx) if 0 <= j < len(keyframes)]
+            best = min(near, key=lambda t: abs(t - target)) if near else target
+            if abs(best - target) > step / 4 or best <= starts[-1]:
+                best = target
+            starts.append(best)
+        ends = starts[1:] + [start + length]
+        return [(a, b - a) for a, b in zip(starts, ends)]
+
+    def _render_chunked(self, input_path, temp_path, part_num, total_parts, chunks, crop_vertical, speed_up,
+                        report, threads, on_progress, variants, cover, crf=None):
+        """Encode a part's video as concurrent sub-chunks and join them losslessly.
+
+        Chunks are encoded video-only with identical settings, so their
+        streams concatenate with -c copy; the concat demuxer lays them end to
+        end on the timestamps, leaving no gap or overlap at the joins. Audio
+        is encoded once for the whole part (AAC chunks would click at every
+        join) and muxed in at the end.
+        """
+        speed = 1.25 if speed_up else 1.0
+        workers = len(chunks)
+        chunk_threads = max(1, (threads or self.encoder.get('threads') or SUPERVISOR.cpu_count()) // workers)
+        part_len = sum(length for _, length in chunks) / speed
+        work_dir = tempfile.mkdtemp(prefix=".chunks-", dir=self.output_dir)
+        names = (None,) + tuple(variants)
+        
+        fractions = {}
+        lock = threading.Lock()
+        state = {'last': 0.0}
+        part_start = time.time()
+        def chunk_progress(k, fraction):
+            with lock:
+                fractions[k] = fraction
+                done = sum(length / speed * fractions.get(j, 0.0) for j, (_, length) in enumerate(chunks)) / part_len
+                now = time.time()
+                if not on_progress and now - state['last'] < 0.25:
+                    return
+                state['last'] = now
+            if on_progress:
+                on_progress(part_num, done)
+            elif done > 0:
+                elapsed = now - part_start
+                report(None, ProgressEvent('progress', part_num, total_parts, pct=int(done * 100),
+                                           eta=int(elapsed / done - elapsed), elapsed=elapsed, length=part_len))
+        
+        # The cover window belongs to whichever chunk holds its start
+        offsets = [(a - chunks[0][0]) / speed for a, _ in chunks]
+        cover_chunk = bisect.bisect_right(offsets, cover[0][0]) - 1 if cover else -1
+        
+        def encode(k):
+            start, length = chunks[k]
+            chunk_path = os.path.join(work_dir, f"chunk{k}.mp4")
+            chunk_cover = ([cover[0][0] - offsets[k]], cover[1]) if k == cover_chunk else None
+            cmd = [self.ffmpeg, "-y", "-ss", str(start), "-t", str(length), "-i", input_path]
+            cmd.extend(self._output_args(chunk_path, crop_vertical, speed_up, chunk_threads, variants,
+                                         chunk_cover, with_audio=False, window=(start, length), crf=crf))
+            return self._monitor_ffmpeg(cmd, part_num, total_parts, length / speed, report,
+                                        on_progress=lambda _, f: chunk_progress(k, f))
+        
+        def encode_audio():
+            if not self._has_audio(input_path):
+                return None
+            audio_path = os.path.join(work_dir, "audio.m4a")
+            start, length = chunks[0][0], sum(l for _, l in chunks)
+            cmd = [self.ffmpeg, "-y", "-ss", str(start), "-t", str(length), "-i", input_path, "-map", "0:a:0", "-vn"]
+            filters = self._audio_filters(speed_up)
+            if filters:
+                cmd.extend(["-af", ",".join(filters)])
+            cmd.extend(["-c:a", "aac", audio_path])
+            return audio_path if self._monitor_ffmpeg(cmd, part_num, total_parts, part_len, report,
+                                                      on_progress=lambda *_: None) else False
+        
+        try:
+            report(None, f"Part {part_num}: encoding {workers} chunks of ~{part_len / workers:.0f}s ({chunk_threads} threads each)")
+            with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+                audio_future = pool.submit(encode_audio)
+                results = list(pool.map(encode, range(workers)))
+                audio_path = audio_future.result()
+            if not all(results) or audio_path is False or self.cancelled:
+                return False
+            
+            # Join every output's chunks; the shared audio goes into each
+            for name in names:
+                list_path = os.path.join(work_dir, f"{name or 'main'}.txt")
+                with open(list_path, 'w', encoding='utf-8') as f:
+                    for k in range(workers):
+                        chunk = self._variant_path(os.path.join(work_dir, f"chunk{k}.mp4"), name)
+                        f.write("file '" + chunk.replace("'", "'\\''") + "'\n")
+                cmd = [self.ffmpeg, "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+                if audio_path:
+                    cmd.extend(["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"])
+                cmd.extend(["-c", "copy", self._variant_path(temp_path, name)])
+                if not self._monitor_ffmpeg(cmd, part_num, total_parts, part_len, report, on_progress=lambda *_: None):
+                    return False
+            if cover_chunk >= 0:
+                chunk_cover = self._variant_path(os.path.join(work_dir, f"chunk{cover_chunk}.mp4"), COVER)
+                if os.path.exists(chunk_cover):
+                    os.replace(chunk_cover, self._variant_path(temp_path, COVER))
+            return True
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _variant_path(self, output_path, name):
+        """Where variant name of a part goes (None is the main part itself)."""
+        if name is None:
+            return output_path
+        root, ext = os.path.splitext(output_path)
+        if name == COVER:
+            # Cover sits beside the part under the same name
+            return f"{root}.jpg"
+        if root.endswith(".partial"):
+            return f"{root[:-len('.partial')]}_{name}.partial{ext}"
+        return f"{root}_{name}{ext}"
+
+    def _partial_path(self, output_path):
+        root, ext = os.path.splitext(output_path)
+        return f"{root}.partial{ext}"
+
+    def _discard(self, path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+    def _discard_part(self, output_path, variants=()):
+        """Remove every unpromoted output of one part."""
+        for name in (None,) + tuple(variants) + (COVER,):
+            self._discard(self._partial_path(self._variant_path(output_path, name)))
+
+    def _verify_parts(self, rendered, variants, need_audio):
+        """Check rendered parts in one batch and promote the ones that pass.
+
+        rendered maps index -> (output_path, expected output seconds), with
+        the outputs still under their .partial names. A part is promoted
+        (cover included) only when its main output and every variant pass;
+        otherwise all of its outputs are discarded. Returns {index: reason}.
+        """
+        names = (None,) + tuple(variants)
+        items = [
+            (self._partial_path(self._variant_path(output_path, name)), length)
+            for output_path, length in rendered.values() for name in names
+        ]
+        failures = verify_batch(items, need_audio)
+        
+        failed = {}
+        for i, (output_path, _) in rendered.items():
+            for name in names:
+                reason = failures.get(self._partial_path(self._variant_path(output_path, name)))
+                if reason:
+                    failed[i] = f"{name}: {reason}" if name else reason
+                    break
+            if i in failed:
+                self._discard_part(output_path, variants)
+                continue
+            for name in names + (COVER,):
+                final = self._variant_path(output_path, name)
+                # A stream-copied part has no cover
+                if os.path.exists(self._partial_path(final)):
+                    os.replace(self._partial_path(final), final)
+        return failed
+
+    def _check_parts(self, rendered, variants, need_audio, report, retry=None, missing=None):
+        """Verify a source's rendered parts, re-rendering each failure once with retry(index).
+
+        rendered maps every planned part's index -> (output_path, expected
+        output seconds); missing maps the ones that were never written to
+        why, and they go through the same retry and report as a failed check.
+        Returns ({index: output_path} of promoted parts, [failure records]).
+        """
+        missing = missing or {}
+        failed = self._verify_parts({i: r for i, r in rendered.items() if i not in missing}, variants, need_audio)
+        failed.update(missing)
+        if failed and retry and not self.cancelled:
+            again = {}
+            for i, reason in sorted(failed.items()):
+                if self.cancelled:
+                    break
+                report(None, f"Part {i+1} failed ({reason.splitlines()[-1]}) - Retrying")
+                self.part_errors.pop(i + 1, None)
+                if retry(i):
+                    again[i] = rendered[i]
+                else:
+                    failed[i] = self.part_errors.get(i + 1) or f"{reason}; retry did not render"
+            still = self._verify_parts(again, variants, need_audio)
+            for i in again:
+                if i in still:
+                    failed[i] = still[i]
+                else:
+                    del failed[i]
+        passed = {i: path for i, (path, _) in rendered.items() if i not in failed}
+        records = [
+            {'part': i + 1, 'path': rendered[i][0], 'reason': reason}
+            for i, reason in sorted(failed.items())
+        ]
+        for record in records:
+            report(None, f"Part {record['part']} failed: {record['reason'].splitlines()[-1]}")
+        return passed, records
+
+    def _part_key(self, fingerprint, start, length, crop_vertical, speed_up, copy, variant=None, keep=None):
+        """Render-cache key: source content plus everything that shapes the part."""
+        params = {
+            'start': round(start, 3),
+            'length': round(length, 3),
+            'copy': copy,
+            # The trim spans are part of the graph
+            'filters': self._filter_args(crop_vertical, speed_up, (start, length), keep),
+            # Pin the thread count: it depends on the worker split, not on the output
+            'encoder': self._encoder_args(threads=1),
+        }
+        if self.size_cap:
+            # The CRF is predicted per part at render time; the cap is what's asked for
+            params['size_cap'] = self.size_cap
+        if variant == COVER:
+            params['variant'] = [COVER, COVER_WIDTH, COVER_WINDOW]
+        elif variant:
+            params['variant'] = VARIANTS[variant]
+            params['encoder'] = self._encoder_args(threads=1, variant=VARIANTS[variant])
+        return self.renders.make_key(fingerprint, params)
+
+    def _part_keys(self, fingerprint, start, length, crop_vertical, speed_up, copy, variants=(), covers=False,
+                   keep=None):
+        """Render-cache keys of one part's outputs by variant (None is the main part)."""
+        names = (None,) + tuple(variants)
+        if covers and not copy:
+            names += (COVER,)
+        return {
+            name: self._part_key(fingerprint, start, length, crop_vertical, speed_up, copy, name, keep)
+            for name in names
+        }
+
+    def _lookup_part(self, keys):
+        """Cached outputs of one part by variant, or None unless every one of them is cached."""
+        hits = {name: self.renders.lookup(key) for name, key in keys.items()}
+        return hits if all(hits.values()) else None
+
+    def _store_part(self, keys, output_path):
+        """Record a rendered part's outputs in the render cache. Returns them by variant."""
+        outputs = {}
+        for name, key in keys.items():
+            path = self._variant_path(output_path, name)
+            if name == COVER and not os.path.exists(path):
+                # Stream-copy fallback or too short to pick from; the part itself is fine
+                continue
+            self.renders.store(key, path)
+            outputs[name] = path
+        return outputs
+
+    def _evict(self, report, keep=()):
+        """Trim the render cache to its budget and say what was deleted or couldn't be."""
+        evicted, over = self.renders.evict(self.render_cache_bytes, keep=keep)
+        if evicted:
+            names = ", ".join(os.path.basename(p) for p in evicted)
+            report(None, f"Render cache: removed {len(evicted)} uploaded parts ({names})")
+        if over:
+            report(None, f"Render cache: {over / 1024**3:.1f} GB over budget in parts not uploaded yet - clear {self.output_dir} by hand")
+
+    def _collect(self, done, variants, sheet_path=None, failed=None):
+        """PartList of finished parts from {index: {variant: path}}, with a contact sheet if asked."""
+        order = sorted(done)
+        covers = [done[i].get(COVER) for i in order]
+        return PartList(
+            [done[i][None] for i in order],
+            {name: [done[i][name] for i in order] for name in variants},
+            covers,
+            self._contact_sheet(covers, sheet_path) if sheet_path else None,
+            failed
+        )
+
+    def _contact_sheet(self, covers, sheet_path):
+        """Tile the part covers into one image. Returns its path, or None without covers or Pillow."""
+        covers = [c for c in covers if c]
+        if not covers or not PIL_AVAILABLE:
+            return None
+        try:
+            images = [Image.open(c) for c in covers]
+            w, h = images[0].size
+            cols = min(SHEET_COLUMNS, len(images))
+            rows = -(-len(images) // cols)
+            sheet = Image.new("RGB", (cols * w, rows * h), "black")
+            for n, img in enumerate(images):
+                sheet.paste(img.convert("RGB").resize((w, h)), ((n % cols) * w, (n // cols) * h))
+                img.close()
+            temp_path = self._partial_path(sheet_path)
+            sheet.save(temp_path, quality=85)
+            os.replace(temp_path, sheet_path)
+            return sheet_path
+        except Exception as e:
+            print(f"Contact Sheet Error: {e}")
+            return None
+
+    def _render_parallel(self, input_path, jobs, total_parts, crop_vertical, speed_up, workers, threads, report,
+                         variants=(), covers=False):
+        """Render parts concurrently on a bounded pool.
+
+        jobs is a list of (index, output_path, start, length, copy, keep). Results come
+        back in part order as (output_path, success, seconds taken) and
+        per-part progress is folded into the single overall bar.
+        """
+        fractions = {}
+        lock = threading.Lock()
+        state = {'last': 0, 'done': 0}
+        start_real = time.time()
+        
+        def on_progress(part_num, fraction):
+            with lock:
+                fractions[part_num] = fraction
+                now = time.time()
+                if now - state['last'] < 0.1:
+                    return
+                state['last'] = now
+                progress = sum(fractions.values()) / len(jobs)
+                active = sum(1 for f in fractions.values() if f < 1.0)
+                done = state['done']
+            elapsed = now - start_real
+            eta = int(elapsed / progress - elapsed) if progress > 0 else 0
+            report(int(10 + progress * 90), ProgressEvent(
+                'aggregate', total=len(jobs), pct=int(progress * 100), eta=eta,
+                elapsed=elapsed, done=done, active=active
+            ))
+        
+        def work(job):
+            i, output_path, start_time_src, current_len_src, copy, keep = job
+            if self.cancelled:
+                return output_path, False, 0.0
+            success, dt = self._render_part(
+                input_path, output_path, i+1, total_parts, start_time_src, current_len_src,
+                crop_vertical, speed_up, report, threads=threads, on_progress=on_progress, copy=copy,
+                variants=variants, covers=covers, keep=keep
+            )
+            with lock:
+                fractions[i+1] = 1.0
+                state['done'] += 1
+            return output_path, success, dt
+        
+        report(None, f"Rendering {len(jobs)} parts on {workers} workers ({threads} threads each)...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(work, job) for job in jobs]
+            return [f.result() for f in futures]
+
+    def _render_single_pass(self, input_path, base_name, parts, crop_vertical, speed_up, report, feed=None, variants=(),
+                            covers=False, with_audio=True):
+        """Decode and filter the source once, letting the segment muxer write every part.
+
+        Each extra variant gets its own segment muxer fed from the same decode,
+        and covers come out as a numbered image sequence. with_audio says
+        whether the input has audio. Returns the output paths of the parts
+        written; they are left under their .partial names.
+        """
+        speed = 1.25 if speed_up else 1.0
+        
+        # Part boundaries on the OUTPUT timeline (after speed-up)
+        part_ends = []
+        for start, length in parts:
+            part_ends.append((start + length) / speed)
+        cut_points = ",".join(f"{t:.3f}" for t in part_ends[:-1])
+        
+        pattern = self._partial_path(os.path.join(self.output_dir, f"{base_name}_part%d.mp4"))
+        cmd = [self.ffmpeg, "-y", "-i", input_path]
+        spans = [(start / speed, length / speed) for start, length in parts]
+        cover = self._cover_windows(spans) if covers else None
+        graph, maps = self._graph(crop_vertical, speed_up, variants, cover, with_audio,
+                                  window=(parts[0][0], parts[-1][0] + parts[-1][1] - parts[0][0]))
+        cmd.extend(graph)
+        for name in (None,) + tuple(variants):
+            cmd.extend(maps[name])
+            cmd.extend(self._encoder_args(variant=VARIANTS.get(name)))
+            # Force an IDR exactly on every cut so each part starts cleanly
+            cmd.extend([
+                "-force_key_frames", cut_points,
+                "-f", "segment",
+                "-segment_format", "mp4",
+                "-segment_times", cut_points,
+                "-segment_start_number", "1",
+                "-reset_timestamps", "1",
+                self._variant_path(pattern, name)
+            ])
+        if cover:
+            cmd.extend(maps[COVER])
+            cmd.extend(["-frames:v", str(len(parts)), "-q:v", "3", "-start_number", "1",
+                        self._variant_path(pattern, COVER)])
         
-        return process.poll() == 0
+        report(None, f"Single pass: {len(parts)} parts from one decode...")
+        success = self._monitor_ffmpeg(cmd, 1, len(parts), part_ends[-1], report, part_ends=part_ends, feed=feed)
+        
+        # Parts written (still .partial, for _verify_parts). On failure the last
+        # segment written is truncated, but every segment before it was closed cleanly.
+        written = []
+        for i in range(len(parts)):
+            output_path = os.path.join(self.output_dir, f"{base_name}_part{i+1}.mp4")
+            if os.path.exists(self._partial_path(output_path)):
+                written.append(output_path)
+        if not success:
+            report(None, "Single pass failed")
+            if written:
+                self._discard_part(written.pop(), variants)
+        return written
+
+    def segment_stream(self, stream, segment_duration=60, crop_vertical=True, speed_up=False, progress_callback=None, variants=(),
+                       covers=False, contact_sheet=False):
+        """Segment a source while it is still downloading.
 
-    def segment_video(self, input_path, segment_duration=60, crop_vertical=True, speed_up=False, progress_callback=None):
+        stream is a DownloadStream. Its bytes are pumped into a single-pass
+        encode, so part 1 is written as soon as enough of the source has
+        arrived and later parts simply wait on the download.
+        """
         self.last_error = None
         self.cancelled = False
-        output_files = []
-        part_times = []
+        self.ingest_pct = -1
+        # Nothing to measure ahead of time on a stream
+        self.loudnorm = None
+        self.crop_track = None
+        self.size_cap = None
         
         def report(pct, msg):
             if progress_callback: progress_callback(pct, msg)
+        
+        ingest = {'eof': False}
+        
+        def pump(sink):
+            received = 0
+            try:
+                while True:
+                    chunk = stream.stdout.read1(1 << 16)
+                    if not chunk:
+                        break
+                    sink.write(chunk)
+                    received += len(chunk)
+                    if stream.expected_bytes:
+                        self.ingest_pct = min(int(received * 100 / stream.expected_bytes), 99)
+                ingest['eof'] = True
+                self.ingest_pct = 100
+            except (OSError, ValueError):
+                # FFmpeg went away (failed or cancelled)
+                pass
+            finally:
+                try:
+                    sink.close()
+                except OSError:
+                    pass
+        
+        try:
+            parts = self._plan_parts(stream.duration, segment_duration, speed_up)
+            
+            # No file to fingerprint yet, so the source identity is the site's video id
+            fingerprint = hashlib.sha1(f"stream:{stream.id}".encode()).hexdigest()
+            base_name = "".join(c for c in stream.title if c.isalnum() or c in " _-").strip()[:30]
+            base_name = f"{base_name}_{fingerprint[:8]}"
+            covers = covers or contact_sheet
+            sheet_path = os.path.join(self.output_dir, f"{base_name}_sheet.jpg") if contact_sheet else None
+            keys = [
+                self._part_keys(fingerprint, start, length, crop_vertical, speed_up, False, variants, covers)
+                for start, length in parts
+            ]
+            
+            # One decode covers every part, so the cache only helps when it has them all
+            cached = [self._lookup_part(k) for k in keys]
+            if all(cached):
+                report(100, f"All {len(parts)} parts cached - Skipping Render")
+                return self._collect(dict(enumerate(cached)), variants, sheet_path)
+            self._evict(report)
+            
+            report(5, f"Streaming: {int(stream.duration)}s | Parts: {len(parts)} {'(1.25x Speed)' if speed_up else ''}")
+            start_overall = time.time()
+            expected = [os.path.join(self.output_dir, f"{base_name}_part{i+1}.mp4") for i in range(len(parts))]
+            speed = 1.25 if speed_up else 1.0
+            written = self._render_single_pass("pipe:0", base_name, parts, crop_vertical, speed_up, report,
+                                               feed=pump, variants=variants, covers=covers,
+                                               with_audio=stream.has_audio)
+            
+            # A download that dies mid-stream looks like a clean EOF to FFmpeg:
+            # check the child's exit status and how far the encode got
+            code = None
+            if ingest['eof']:
+                try:
+                    code = stream.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    pass
+            end = (parts[-1][0] + parts[-1][1]) / speed
+            short = None
+            if code:
+                short = f"download failed (yt-dlp exited with code {code})"
+            elif self.out_time < end - STREAM_SLACK:
+                short = f"source ended at {self.out_time:.0f}s of {end:.0f}s"
+            if self.cancelled:
+                short = None
+            elif short:
+                self.last_error = f"Stream incomplete: {short}"
+                report(None, self.last_error)
+            elif self.last_error:
+                short = self.last_error
+            
+            # The stream can't be re-read, so a part that fails its check is reported, not retried.
+            # Audio isn't required: the stream format may be video-only.
+            indexes = [expected.index(path) for path in written]
+            missing = {} if self.cancelled else {
+                i: short or "not written" for i in range(len(parts)) if i not in indexes
+            }
+            rendered = {i: (expected[i], parts[i][1] / speed) for i in indexes + list(missing)}
+            passed, failed = self._check_parts(rendered, variants, False, report, missing=missing)
+            done = {i: self._store_part(keys[i], path) for i, path in passed.items()}
+            
+            if self.cancelled:
+                report(0, "Cancelled.")
+                return self._collect(done, variants, failed=failed)
+            
+            total_time = time.time() - start_overall
+            if short or failed:
+                # Nothing here can be re-read: the caller should fetch the whole source again
+                self.last_error = self.last_error or f"{len(failed)}/{len(parts)} parts failed"
+                report(100, f"Incomplete: {len(done)}/{len(parts)} parts in {total_time:.1f}s")
+            else:
+                report(100, f"Done! Total: {total_time:.1f}s | Avg: {total_time / len(parts):.1f}s/part")
+            return self._collect(done, variants, sheet_path, failed)
+        
+        except Exception as e:
+            self.last_error = str(e)
+            report(0, f"Error: {e}")
+            return PartList()
+        finally:
+            self.ingest_pct = -1
 
-        # Colors (HTML)
-        C_WHITE = "#FFFFFF"
-        C_DIM = "#888888"
-        C_GREEN = "#107C10"
+    def segment_video(self, input_path, segment_duration=60, crop_vertical=True, speed_up=False, progress_callback=None, single_pass=False, workers=None, smart_cuts=False, variants=(), covers=False, contact_sheet=False, normalize_audio=False, smart_crop=False, highlights=0, trim_dead_air=False, max_size_mb=0):
+        """Cut input_path into parts. Returns a PartList of the main parts.
+
+        variants names extra VARIANTS entries rendered from the same decode
+        as each main part; they are listed in the result's .variants. covers
+        adds a cover image per re-encoded part (.covers) and contact_sheet
+        tiles them into one image per source (.sheet). normalize_audio
+        brings every part to the same loudness from one measurement per source.
+        smart_crop (with crop_vertical) crops 9:16 outputs to a window that
+        follows the action instead of padding the whole frame. highlights > 0
+        renders only that many best-scoring, non-overlapping part-length
+        windows instead of the whole source. trim_dead_air cuts silent,
+        frozen stretches out of the parts and re-plans them so each is
+        still filled with segment_duration of real content. max_size_mb
+        caps each main part's size: its CRF is predicted from a short probe
+        encode and the log of past encodes.
+        """
+        self.last_error = None
+        self.cancelled = False
+        variants = tuple(variants)
+        covers = covers or contact_sheet
+        self.loudnorm = None
+        self.crop_track = None
+        self.size_cap = int(max_size_mb * 2**20) if max_size_mb else None
+        self.part_errors = {}
+        self.copy_fallbacks = set()
+        output_files = PartList()
+        part_times = []
+        
+        def report(pct, msg):
+            if progress_callback: progress_callback(pct, msg)
 
         try:
             report(0, "Scanning video...")
@@ -155,100 +1388,247 @@ class VideoProcessor:
             
             if duration == 0:
                 report(0, "Error: Could not read video file.")
-                return []
+                return PartList()
+            
+            parts = self._plan_parts(duration, segment_duration, speed_up)
+            num_segments = len(parts)
+            
+            # Highlights: only the best windows, from the same cached analysis pass as smart cuts
+            if num_segments <= highlights:
+                highlights = 0
+            if highlights:
+                report(None, "Scoring highlights...")
+                analysis = SourceAnalyzer(self).analyze(input_path, duration, report)
+                if self.cancelled:
+                    report(0, "Cancelled.")
+                    return PartList()
+                picked = plan_highlights(analysis, parts[0][1], highlights)
+                if picked:
+                    report(None, f"Highlights: {len(picked)} of {num_segments} parts at "
+                                 + ", ".join(f"{int(start // 60)}:{int(start % 60):02d}" for start, _ in picked))
+                    parts = picked
+                    num_segments = len(parts)
+                else:
+                    highlights = 0
+                    report(None, "Highlights unavailable - rendering every part")
+            
+            # Dead air: re-plan the parts over what's left once silent, frozen stretches are cut
+            keeps = [None] * num_segments
+            trimmed = False
+            if trim_dead_air and not highlights:
+                report(None, "Finding dead air...")
+                analysis = SourceAnalyzer(self).analyze(input_path, duration, report)
+                if self.cancelled:
+                    report(0, "Cancelled.")
+                    return PartList()
+                live = plan_trims(analysis, duration)
+                if live:
+                    parts, keeps = [], []
+                    for spans in plan_content_parts(live, segment_duration * (1.25 if speed_up else 1.0)):
+                        start = spans[0][0]
+                        parts.append((start, spans[-1][0] + spans[-1][1] - start))
+                        # Offsets within the part's source span; one span needs no trim
+                        keeps.append([(a - start, length) for a, length in spans] if len(spans) > 1 else None)
+                    report(None, f"Dead air: {duration - sum(b - a for a, b in live):.0f}s trimmed, "
+                                 f"{num_segments} -> {len(parts)} parts")
+                    num_segments = len(parts)
+                    trimmed = True
+                elif analysis:
+                    report(None, "No dead air found")
+                else:
+                    report(None, "Dead air unavailable - rendering as is")
+            
+            # Smart cuts: nudge boundaries onto pauses / scene changes
+            # (trimmed parts already end on content, and their spans are fixed)
+            if smart_cuts and num_segments > 1 and not highlights and not trimmed:
+                report(None, "Analyzing scenes and silence...")
+                analysis = SourceAnalyzer(self).analyze(input_path, duration, report)
+                if self.cancelled:
+                    report(0, "Cancelled.")
+                    return PartList()
+                if analysis:
+                    window = min(self.cut_window, parts[0][1] / 4)
+                    parts = plan_cuts(parts, analysis, window)
+                else:
+                    report(None, "Smart cuts unavailable - using fixed cuts")
             
-            # Adjust effective duration if speeding up
-            effective_duration = duration / 1.25 if speed_up else duration
-            num_segments = math.ceil(effective_duration / segment_duration)
+            # Loudness: measured once per source (cached), applied in every part's filters
+            if normalize_audio:
+                report(None, "Measuring loudness...")
+                measured = SourceAnalyzer(self).loudness(input_path)
+                if self.cancelled:
+                    report(0, "Cancelled.")
+                    return PartList()
+                if measured:
+                    self.loudnorm = loudnorm_filter(measured)
+                    report(None, f"Loudness: {float(measured['input_i']):.1f} LUFS -> {LOUDNESS_TARGET['I']:.0f} LUFS")
+                else:
+                    report(None, "Loudness unavailable - audio left as is")
             
+            # Smart crop: one low-res pass (cached) tracks where the action is
+            if smart_crop and crop_vertical:
+                report(None, "Tracking crop window...")
+                t0 = time.time()
+                track = SmartCropper(self).track(input_path, duration, w, h, report)
+                if self.cancelled:
+                    report(0, "Cancelled.")
+                    return PartList()
+                if track:
+                    self.crop_track = crop_keypoints(track, w, h)
+                    report(None, f"Smart crop: {len(self.crop_track['points'])} keypoints "
+                                 f"({duration / max(time.time() - t0, 0.001):.0f}x realtime)")
+                else:
+                    report(None, "Smart crop unavailable - using fit and pad")
+            
+            # Size cap: CRF model from this preset's logged encodes
+            if self.size_cap:
+                self.rate_model = RateModel.fit(self.encode_log.samples(self.encoder['preset'], self.encoder.get('tune')))
+                report(None, f"Size cap: {max_size_mb} MB per part | CRF model from {self.rate_model.samples} past encodes")
+            
+            # Split only: cut on keyframes and remux instead of transcoding
+            copy_flags = [False] * num_segments
+            # (Highlights and trimmed parts aren't contiguous, which snapping and the segment muxer both assume)
+            # (A stream copy keeps the source bitrate, so it can't honour a size cap)
+            if not crop_vertical and not speed_up and not variants and not highlights and not trimmed and not self.size_cap:
+                report(None, "Indexing keyframes...")
+                snapped = self._snap_parts(parts, self._get_keyframes(input_path))
+                parts = [(start, length) for start, length, _ in snapped]
+                copy_flags = [copy for _, _, copy in snapped]
+                report(None, f"Stream copy: {sum(copy_flags)}/{num_segments} parts cut on keyframes")
+                if covers and any(copy_flags):
+                    report(None, "No covers for stream-copied parts (nothing is decoded)")
+            
+            # Content fingerprint in the name: two sources can't share parts
+            fingerprint = self.cache.get_fingerprint(input_path)
             base_name = os.path.splitext(os.path.basename(input_path))[0]
             base_name = "".join(c for c in base_name if c.isalnum() or c in " _-").strip()[:30]
+            base_name = f"{base_name}_{fingerprint[:8]}"
             
             report(5, f"Source: {int(duration)}s | Parts: {num_segments} {'(1.25x Speed)' if speed_up else ''}")
 
             start_overall = time.time()
             
-            for i in range(num_segments):
+            expected = [os.path.join(self.output_dir, f"{base_name}_part{i+1}.mp4") for i in range(num_segments)]
+            keys = [
+                self._part_keys(fingerprint, start, length, crop_vertical, speed_up, copy_flags[i], variants, covers,
+                                keeps[i])
+                for i, (start, length) in enumerate(parts)
+            ]
+            sheet_path = os.path.join(self.output_dir, f"{base_name}_sheet.jpg") if contact_sheet else None
+            
+            # Render cache: reuse parts rendered from the same source with the same settings
+            cached = {}
+            for i, part_keys in enumerate(keys):
+                hit = self._lookup_part(part_keys)
+                if hit:
+                    cached[i] = hit
+                    report(None, f"Part {i+1} Cached - Skipping Render")
+            self._evict(report, keep=[p for hit in cached.values() for p in hit.values()])
+            
+            # Finished parts by index ({variant: path}): cache hits plus everything verified now
+            done = dict(cached)
+            failed = []
+            speed = 1.25 if speed_up else 1.0
+            # Output seconds of each part (a trimmed part is only its kept spans)
+            lengths = [sum(l for _, l in keep) / speed if keep else length / speed
+                       for (_, length), keep in zip(parts, keeps)]
+            need_audio = self._has_audio(input_path)
+            def collect(sheet=False):
+                return self._collect(done, variants, sheet_path if sheet else None, failed)
+            
+            def finish(rendered):
+                # One integrity batch per source; a failed part is re-encoded once.
+                # Parts that were never written (a failed run, a single pass cut short)
+                # go through the same retry and report, unless the user cancelled.
+                missing = {} if self.cancelled else {
+                    i: self.part_errors.get(i + 1) or self.last_error or "not rendered"
+                    for i in range(num_segments) if i not in cached and i not in rendered
+                }
+                def retry(i):
+                    # Same settings as the first attempt, so the result matches its cache key
+                    start, length = parts[i]
+                    return self._render_part(
+                        input_path, expected[i], i+1, num_segments, start, length,
+                        crop_vertical, speed_up, report, threads=threads, copy=copy_flags[i],
+                        variants=variants, covers=covers, keep=keeps[i]
+                    )[0]
+                passed, failures = self._check_parts(
+                    {i: (expected[i], lengths[i]) for i in list(rendered) + list(missing)},
+                    variants, need_audio, report, retry, missing
+                )
+                for i, path in passed.items():
+                    part_keys = keys[i]
+                    if i + 1 in self.copy_fallbacks:
+                        # Re-encoded after a failed copy: cache it as the encode it is
+                        start, length = parts[i]
+                        part_keys = self._part_keys(fingerprint, start, length, crop_vertical, speed_up, False,
+                                                    variants, covers, keeps[i])
+                    done[i] = self._store_part(part_keys, path)
+                failed.extend(failures)
+            
+            # (A smart crop over the whole source would have to thin its keypoints to fit one expression)
+            # Encoder threads per part: FFmpeg's default unless parts render side by side
+            threads = None
+            if (single_pass and num_segments > 1 and len(cached) < num_segments and not any(copy_flags)
+                    and not highlights and not trimmed and not self.size_cap and not self.crop_track):
+                paths = self._render_single_pass(input_path, base_name, parts, crop_vertical, speed_up, report,
+                                                 variants=variants, covers=covers, with_audio=need_audio)
+                finish({expected.index(path): path for path in paths})
                 if self.cancelled:
                     report(0, "Cancelled.")
-                    return output_files
-                
-                # Calculate time chunks based on ORIGINAL duration
-                # If we speed up, we need to grab 1.25x more content to fill the same 60s slot
-                chunk_len_src = segment_duration * 1.25 if speed_up else segment_duration
-                start_time_src = i * chunk_len_src
-                
-                if start_time_src >= duration: break
-                
-                current_len_src = min(chunk_len_src, duration - start_time_src)
-                if current_len_src < 1.0: continue
-
-                output_filename = f"{base_name}_part{i+1}.mp4"
-                output_path = os.path.join(self.output_dir, output_filename)
-                
-                # Smart Skip: Check if valid file exists
-                if os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
-                    report(None, f"Part {i+1} Exists - Skipping Render")
-                    output_files.append(output_path)
-                    continue
+                    return collect()
                 
-                part_start = time.time()
-                report(None, f"Part {i+1} Starting...")
-                
-                # BUILD COMMAND
-                cmd = [self.ffmpeg, "-y", "-ss", str(start_time_src), "-t", str(current_len_src), "-i", input_path]
-                
-                filter_complex = []
-                
-                # 1. Speed Filter (Must trigger first to affect timestamps)
-                if speed_up:
-                    # setpts=PTS/1.25 (Speed Visuals), atempo=1.25 (Speed Audio + Pitch Correct)
-                    filter_complex.append("setpts=PTS/1.25,atempo=1.25")
-                
-                # 2. Crop/Scale Filter
-                if crop_vertical:
-                    filter_complex.append("scale=720:1280:force_original_aspect_ratio=decrease,pad=720:1280:(ow-iw)/2:(oh-ih)/2:color=black")
-
-                # Combine filters
-                if filter_complex:
-                    cmd.extend(["-filter_complex", ",".join(filter_complex)])
-                
-                # Encoding Settings
-                cmd.extend([
-                    "-c:v", "libx264", 
-                    "-preset", "ultrafast", 
-                    "-crf", "23",
-                    "-c:a", "aac", 
-                    output_path
-                ])
-                
-                # Execute with Real-Time Monitoring
-                success = self._monitor_ffmpeg(cmd, i+1, num_segments, current_part_len, report)
-                
-                # Record Timing
-                dt = time.time() - part_start
-                part_times.append(dt)
-                
-                if success:
-                    # Completion Format: Part 1 Complete | 100% | 14.6s
-                    msg = (
-                        f"<span style='color:{C_WHITE}'>Part {i+1} Complete</span> "
-                        f"<span style='color:{C_DIM}'>|</span> "
-                        f"<span style='color:{C_GREEN}'>100%</span> "
-                        f"<span style='color:{C_DIM}'>|</span> "
-                        f"<span style='color:{C_WHITE}'>{dt:.1f}s</span> "
-                        f"<span style='color:{C_DIM}'>|</span> "
-                        f"<span style='color:{C_DIM}'>Length: {current_part_len:.1f}s</span>"
+                total_time = time.time() - start_overall
+                report(100, f"Done! Total: {total_time:.1f}s | Avg: {total_time / num_segments:.1f}s/part")
+                return collect(sheet=True)
+            
+            workers = min(workers or self.workers, num_segments)
+            jobs = []
+            for i, (start_time_src, current_len_src) in enumerate(parts):
+                if i not in cached:
+                    jobs.append((i, expected[i], start_time_src, current_len_src, copy_flags[i], keeps[i]))
+            
+            rendered = {}
+            if workers > 1 and len(jobs) > 1:
+                threads = max(1, SUPERVISOR.cpu_count() // workers)
+                results = self._render_parallel(input_path, jobs, num_segments, crop_vertical, speed_up, workers, threads,
+                                                report, variants=variants, covers=covers)
+                for job, (output_path, success, dt) in zip(jobs, results):
+                    if success:
+                        rendered[job[0]] = output_path
+                part_times = [dt for _, _, dt in results]
+            else:
+                for i, output_path, start_time_src, current_len_src, copy, keep in jobs:
+                    if self.cancelled:
+                        break
+                    
+                    report(None, f"Part {i+1} Starting...")
+                    success, dt = self._render_part(
+                        input_path, output_path, i+1, num_segments, start_time_src, current_len_src,
+                        crop_vertical, speed_up, report, copy=copy, variants=variants, covers=covers, keep=keep
                     )
-                    report(None, msg)
-                else:
-                    report(None, f"Part {i+1} Failed")
-                
-                output_files.append(output_path)
-                
-                # Update Overall Bar
-                overall_pct = int(10 + ((i+1) / num_segments) * 90)
-                report(overall_pct, None)
+                    
+                    # Record Timing
+                    part_times.append(dt)
+                    if success:
+                        rendered[i] = output_path
+                    
+                    # Update Overall Bar
+                    overall_pct = int(10 + ((i+1) / num_segments) * 90)
+                    report(overall_pct, None)
+            
+            # Parts finished before a cancel are still checked and kept (retries are skipped)
+            finish(rendered)
+            if self.cancelled:
+                report(0, "Cancelled.")
+                return collect()
+            
+            output_files = collect(sheet=True)
+            
+            if self.size_cap:
+                over, total = self.encode_log.overshoots()
+                if total:
+                    report(None, f"Size cap: {over}/{total} recent parts over the cap on the first pass ({over / total:.1%})")
             
             # FINAL SUMMARY
             total_time = time.time() - start_overall
@@ -0,0 +1,171 @@
+"""
+Size-targeted encoding - pick the CRF that lands a part under a size cap.
+
+Before a capped part is encoded, a few short samples of it go through the
+same filters and encoder at the profile's CRF (the probe). How the whole
+part's bitrate relates to the probe's is learned from our own encodes:
+every capped encode is logged with its probe and CRF, and a small ridge
+regression
+
+    log(part bps / probe bps) = c0 + c1 * (crf - probe crf) + c2 * log(probe bps / 1 Mbps)
+
+is fitted per encoder preset. With little history the fit stays close to
+x264's rule of thumb (+6 CRF halves the bitrate). The CRF is solved from
+the fit for the cap's video budget. Overshoots are logged with everything
+else and are the metric the model is judged by.
+
+Stats (run from the project root):  python -m modules.ratecontrol
+"""
+
+import os
+import sys
+import math
+import time
+import sqlite3
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+PROBE_SAMPLES = 3       # Samples per probe, spread over the part
+PROBE_SECONDS = 2.0     # Source seconds per sample
+AUDIO_BPS = 128000      # FFmpeg's default AAC bitrate, taken off the budget
+SIZE_MARGIN = 0.05      # Share of the cap kept free for container overhead and misprediction
+PRIOR = (0.0, -math.log(2) / 6, 0.0)
+PRIOR_WEIGHT = 4.0      # Pull toward PRIOR, worth this many logged encodes
+MIN_SAMPLES = 5         # Logged encodes before the fit replaces the prior
+HISTORY = 500           # Most recent encodes used for the fit and the overshoot rate
+MAX_CRF = 51
+LOG_REF = math.log(1e6)
+
+
+def video_bps(size, seconds, audio):
+    """Video bits per second of a finished part of size bytes."""
+    return max(size * 8 / seconds - (AUDIO_BPS if audio else 0), 1.0)
+
+
+def budget_bps(cap, seconds, audio):
+    """Video bits per second that keep a part of seconds under cap bytes."""
+    return max(cap * 8 * (1 - SIZE_MARGIN) / seconds - (AUDIO_BPS if audio else 0), 1.0)
+
+
+class RateModel:
+    def __init__(self, coef=PRIOR, samples=0):
+        self.coef = tuple(coef)
+        self.samples = samples
+
+    @classmethod
+    def fit(cls, rows):
+        """Ridge fit on logged encodes ({probe_bps, probe_crf, crf, seconds, bytes, audio}), toward PRIOR."""
+        if not NUMPY_AVAILABLE or len(rows) < MIN_SAMPLES:
+            return cls(samples=len(rows))
+        x = np.array([[1.0, r['crf'] - r['probe_crf'], math.log(r['probe_bps']) - LOG_REF] for r in rows])
+        y = np.array([math.log(video_bps(r['bytes'], r['seconds'], r['audio']) / r['probe_bps']) for r in rows])
+        a = x.T @ x + PRIOR_WEIGHT * np.eye(3)
+        b = x.T @ y + PRIOR_WEIGHT * np.array(PRIOR)
+        coef = np.linalg.solve(a, b)
+        # A fit that no longer lowers the bitrate with CRF is no use for solving
+        if coef[1] > PRIOR[1] / 4:
+            return cls(samples=len(rows))
+        return cls([float(c) for c in coef], len(rows))
+
+    def predict_bps(self, probe_bps, probe_crf, crf):
+        c0, c1, c2 = self.coef
+        return probe_bps * math.exp(c0 + c1 * (crf - probe_crf) + c2 * (math.log(probe_bps) - LOG_REF))
+
+    def crf_for(self, probe_bps, probe_crf, target_bps):
+        """CRF expected to bring the part to target_bps, never below probe_crf."""
+        c0, c1, c2 = self.coef
+        delta = (math.log(target_bps / probe_bps) - c0 - c2 * (math.log(probe_bps) - LOG_REF)) / c1
+        return round(min(max(probe_crf + delta, probe_crf), MAX_CRF), 1)
+
+
+class EncodeLog:
+    """Capped encodes and how they turned out, in the media cache database."""
+
+    def __init__(self, db_path="media_cache.db"):
+        self.db_path = os.path.join(os.path.dirname(__file__), '..', db_path)
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS encodes
+                     (id INTEGER PRIMARY KEY,
+                      time REAL,
+                      preset TEXT,
+                      tune TEXT,
+                      probe_bps REAL,
+                      probe_crf REAL,
+                      crf REAL,
+                      seconds REAL,
+                      bytes INTEGER,
+                      audio INTEGER,
+                      cap INTEGER,
+                      attempt INTEGER)''')
+        conn.commit()
+        conn.close()
+
+    def add(self, encoder, plan, size, cap, attempt=1):
+        """Record one encode of a sized part (plan from the processor's size plan)."""
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO encodes (time, preset, tune, probe_bps, probe_crf, crf, seconds, bytes, audio, cap, attempt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), encoder['preset'], encoder.get('tune') or '', plan['probe_bps'], plan['probe_crf'],
+                 plan['crf'], plan['seconds'], size, int(plan['audio']), cap, attempt))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Encode Log Error: {e}")
+
+    def samples(self, preset, tune=None, limit=HISTORY):
+        """Most recent encodes with these encoder settings, as dicts."""
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT probe_bps, probe_crf, crf, seconds, bytes, audio FROM encodes "
+                      "WHERE preset=? AND tune=? AND seconds > 0 AND probe_bps > 0 ORDER BY id DESC LIMIT ?",
+                      (preset, tune or '', limit))
+            keys = ('probe_bps', 'probe_crf', 'crf', 'seconds', 'bytes', 'audio')
+            rows = [dict(zip(keys, row)) for row in c.fetchall()]
+            conn.close()
+            return rows
+        except Exception as e:
+            print(f"Encode Log Error: {e}")
+            return []
+
+    def overshoots(self, limit=HISTORY):
+        """(first-pass encodes over their cap, first-pass encodes) among the most recent."""
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*), COALESCE(SUM(bytes > cap), 0) FROM "
+                      "(SELECT bytes, cap FROM encodes WHERE attempt=1 ORDER BY id DESC LIMIT ?)", (limit,))
+            total, over = c.fetchone()
+            conn.close()
+            return over, total
+        except Exception as e:
+            print(f"Encode Log Error: {e}")
+            return 0, 0
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from modules.encoder_profile import load_profile
+
+    profile = load_profile()
+    log = EncodeLog()
+    model = RateModel.fit(log.samples(profile['preset'], profile.get('tune')))
+    over, total = log.overshoots()
+    fitted = "fitted" if model.samples >= MIN_SAMPLES and model.coef != PRIOR else "prior"
+    print(f"Preset {profile['preset']}: {model.samples} logged encodes, {fitted} model "
+          f"c = ({', '.join(f'{c:.4f}' for c in model.coef)})")
+    print(f"Overshoots: {over}/{total} first-pass encodes over their cap"
+          + (f" ({over / total:.1%})" if total else ""))
@@ -0,0 +1,139 @@
+import sqlite3
+import os
+import json
+import time
+import hashlib
+
+class RenderCache:
+    """Manifest of rendered parts, keyed by a hash of source + render settings.
+
+    A part is only reused when its key matches exactly (same source content,
+    same cut, same filters and encoder settings) and the file on disk still
+    has the size and mtime recorded when it was written. Total size is kept
+    under a budget by deleting the least recently used parts, but only parts
+    that have been consumed (uploaded) - anything still waiting is left alone.
+    """
+
+    def __init__(self, db_path="media_cache.db"):
+        self.db_path = os.path.join(os.path.dirname(__file__), '..', db_path)
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        """Initialize the manifest table if it doesn't exist."""
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS renders
+                     (key TEXT PRIMARY KEY,
+                      path TEXT,
+                      size INTEGER,
+                      mtime REAL,
+                      last_used REAL,
+                      consumed INTEGER DEFAULT 0)''')
+        c.execute("PRAGMA table_info(renders)")
+        if 'consumed' not in [row[1] for row in c.fetchall()]:
+            c.execute("ALTER TABLE renders ADD COLUMN consumed INTEGER DEFAULT 0")
+        c.execute("CREATE INDEX IF NOT EXISTS renders_path ON renders (path)")
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def make_key(fingerprint, params):
+        """Stable hash of the source fingerprint and every setting that shapes the output."""
+        blob = json.dumps({'source': fingerprint, 'params': params}, sort_keys=True)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def lookup(self, key):
+        """Path of a verified cached render for key, or None. Marks it as recently used and unconsumed."""
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT path, size, mtime FROM renders WHERE key=?", (key,))
+            row = c.fetchone()
+            if not row:
+                conn.close()
+                return None
+            path, size, mtime = row
+            try:
+                st = os.stat(path)
+                valid = st.st_size == size and st.st_mtime == mtime
+            except OSError:
+                valid = False
+            if valid:
+                # Handed out again, so it waits for another upload before it can go
+                c.execute("UPDATE renders SET last_used=?, consumed=0 WHERE key=?", (time.time(), key))
+            else:
+                # Deleted, truncated or overwritten since it was recorded
+                c.execute("DELETE FROM renders WHERE key=?", (key,))
+            conn.commit()
+            conn.close()
+            return path if valid else None
+        except Exception as e:
+            print(f"Render Cache Error: {e}")
+            return None
+
+    def store(self, key, path):
+        """Record a finished render. Any older entry for the same path is replaced."""
+        try:
+            st = os.stat(path)
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM renders WHERE path=?", (path,))
+            c.execute("INSERT OR REPLACE INTO renders (key, path, size, mtime, last_used, consumed) VALUES (?, ?, ?, ?, ?, 0)",
+                      (key, path, st.st_size, st.st_mtime, time.time()))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Render Cache Error: {e}")
+            return False
+
+    def mark_consumed(self, paths):
+        """Flag renders as uploaded, which makes them eligible for eviction."""
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.executemany("UPDATE renders SET consumed=1 WHERE path=?", [(p,) for p in paths])
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Render Cache Error: {e}")
+
+    def evict(self, max_bytes, keep=()):
+        """Delete least recently used consumed renders until the total fits in max_bytes.
+
+        Renders not yet marked consumed and paths in keep are never deleted.
+        Returns (evicted paths, bytes still over budget).
+        """
+        keep = {os.path.abspath(p) for p in keep}
+        evicted = []
+        total = 0
+        try:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT key, path, size, consumed FROM renders ORDER BY last_used ASC")
+            rows = c.fetchall()
+            total = sum(r[2] for r in rows)
+            for key, path, size, consumed in rows:
+                if total <= max_bytes:
+                    break
+                if os.path.abspath(path) in keep:
+                    continue
+                exists = os.path.exists(path)
+                if exists and not consumed:
+                    continue
+                try:
+                    if exists:
+                        os.remove(path)
+                        evicted.append(path)
+                except OSError:
+                    continue
+                c.execute("DELETE FROM renders WHERE key=?", (key,))
+                total -= size
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Render Cache Error: {e}")
+        return evicted, max(0, total - max_bytes)
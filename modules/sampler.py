@@ -0,0 +1,238 @@
+"""
+Frame sampler - one low-resolution decode feeding any number of frame analysers.
+
+FFmpeg decimates the source to a low frame rate and scales it down right
+after decode, then streams rawvideo to us. Frames are read with readinto()
+straight into a preallocated ring of NumPy batches, so nothing is allocated
+per frame. Each batch is handed to every consumer in turn; the ring keeps
+the previous batch intact while the next one is read, so a consumer may
+hold a view of it (e.g. its last frame, for a difference) until its next
+feed. Anything kept longer must be copied.
+
+Benchmark on a synthetic source (run from the project root):
+    python -m modules.sampler
+"""
+
+import os
+import sys
+import time
+import subprocess
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Bytes per pixel of the rawvideo formats a consumer can ask for
+PIX_FMTS = {'gray': 1, 'rgb24': 3}
+BATCH_FRAMES = 32   # Frames per readinto() batch
+RING_SLOTS = 2      # Batches kept: the one being analysed and the one before it
+
+
+class FrameConsumer:
+    """An analyser fed by FrameSampler.
+
+    start() is called before the first batch, feed() with each batch of
+    frames (uint8, (n, height, width[, 3])) and their source times in
+    seconds, and finish() once the decode ends.
+    """
+    def start(self, sampler):
+        pass
+
+    def feed(self, frames, times):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+class FrameSampler:
+    def __init__(self, processor, fps=4, width=64, height=36, pix_fmt='gray', batch=BATCH_FRAMES, skip_nonref=False,
+                 scale_flags='fast_bilinear'):
+        # Borrow the processor's FFmpeg and cancellable process tracking
+        self.processor = processor
+        # Don't decode frames nothing references (B-frames): a cheaper decode
+        # for analysers that only need a few frames per second
+        self.skip_nonref = skip_nonref
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        # fast_bilinear is plenty for motion; 'area' averages properly for tiny hash frames
+        self.scale_flags = scale_flags
+        self.batch = batch
+        channels = PIX_FMTS[pix_fmt]
+        self.frame_shape = (height, width) + ((channels,) if channels > 1 else ())
+        self.frame_bytes = width * height * channels
+        self.frames = 0
+
+        self.ring = np.empty((RING_SLOTS, batch) + self.frame_shape, dtype=np.uint8)
+        self.times = np.empty((RING_SLOTS, batch), dtype=np.float64)
+        self._offsets = np.arange(batch, dtype=np.float64)
+        # Byte views of each slot, made once: readinto() fills them in place
+        self._views = [memoryview(self.ring[slot]).cast('B') for slot in range(RING_SLOTS)]
+
+    def command(self, source, start=None, length=None, extra_outputs=()):
+        """FFmpeg command for source (a path, or a list of input args such as a lavfi spec).
+
+        extra_outputs are appended after the rawvideo pipe, so one decode can
+        also write e.g. an audio track to a file.
+        """
+        cmd = [self.processor.ffmpeg, "-y", "-hide_banner", "-loglevel", "error"]
+        if start:
+            cmd.extend(["-ss", f"{start:.3f}"])
+        if length:
+            cmd.extend(["-t", f"{length:.3f}"])
+        if self.skip_nonref:
+            cmd.extend(["-skip_frame", "nonref"])
+        cmd.extend(source if isinstance(source, list) else ["-i", source])
+        cmd.extend([
+            # Drop to the sample rate first, then shrink, so the filter work is tiny
+            "-map", "0:v:0",
+            "-vf", f"fps={self.fps},scale={self.width}:{self.height}:flags={self.scale_flags},format={self.pix_fmt}",
+            "-f", "rawvideo", "pipe:1",
+        ])
+        cmd.extend(extra_outputs)
+        return cmd
+
+    def run(self, source, consumers, start=None, length=None, extra_outputs=(), duration=None, progress_callback=None):
+        """Decode source once and feed every consumer. Returns True if the decode finished cleanly.
+
+        Frame times are on the source timeline (start is added back).
+        """
+        cmd = self.command(source, start, length, extra_outputs)
+        # Unbuffered: readinto() goes from the pipe straight into the ring
+        process = self.processor._spawn(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        for consumer in consumers:
+            consumer.start(self)
+
+        self.frames = 0
+        slot = 0
+        total = max(int((length or duration or 0) * self.fps), 1)
+        report_every = self.fps * 60
+        try:
+            while not self.processor.cancelled:
+                n = self._fill(process.stdout, self._views[slot])
+                if n == 0:
+                    break
+                frames = self.ring[slot, :n]
+                times = self.times[slot, :n]
+                np.add(self._offsets[:n], self.frames, out=times)
+                times /= self.fps
+                if start:
+                    times += start
+                for consumer in consumers:
+                    consumer.feed(frames, times)
+
+                before = self.frames
+                self.frames += n
+                if progress_callback and self.frames // report_every > before // report_every:
+                    progress_callback(None, f"Analyzing... {min(int(self.frames / total * 100), 100)}%")
+                if n < self.batch:
+                    break
+                slot = (slot + 1) % RING_SLOTS
+            if self.processor.cancelled:
+                process.kill()
+            ok = process.wait() == 0 and not self.processor.cancelled
+        finally:
+            self.processor._release(process)
+        for consumer in consumers:
+            consumer.finish()
+        return ok
+
+    def _fill(self, pipe, view):
+        """Read up to one batch into view. Returns the number of whole frames read."""
+        got = 0
+        while got < len(view):
+            n = pipe.readinto(view[got:])
+            if not n:
+                break
+            got += n
+        return got // self.frame_bytes
+
+
+class SceneScorer(FrameConsumer):
+    """Mean absolute difference (0-1) between each frame and the one before it."""
+    def start(self, sampler):
+        self.scores = []
+        self.prev = None
+        # Work buffers for one batch plus the previous frame
+        self._work = np.empty((sampler.batch + 1,) + sampler.frame_shape, dtype=np.int16)
+        self._diff = np.empty((sampler.batch,) + sampler.frame_shape, dtype=np.int16)
+
+    def feed(self, frames, times):
+        n = len(frames)
+        work = self._work[:n + 1]
+        np.copyto(work[1:], frames, casting='unsafe')
+        if self.prev is None:
+            work[0] = work[1]
+        else:
+            work[0] = self.prev
+        diff = self._diff[:n]
+        np.subtract(work[1:], work[:-1], out=diff)
+        np.abs(diff, out=diff)
+        axes = tuple(range(1, diff.ndim))
+        self.scores.extend((diff.mean(axis=axes) / 255.0).tolist())
+        # Still valid on the next feed: the ring doesn't reuse this slot until after it
+        self.prev = frames[-1]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB."""
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 2**20
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark(processor, seconds=120, size="1280x720", rate=30, samplers=((4, 64, 36, 'gray'), (2, 160, 90, 'rgb24'))):
+    """Sample a synthetic clip at each (fps, width, height, pix_fmt) setting, two consumers per decode.
+
+    Returns one result dict per setting.
+    """
+    source = ["-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}:duration={seconds}"]
+    results = []
+    for fps, width, height, pix_fmt in samplers:
+        sampler = FrameSampler(processor, fps, width, height, pix_fmt)
+        scenes, other = SceneScorer(), SceneScorer()
+        t0 = time.time()
+        ok = sampler.run(source, [scenes, other], duration=seconds)
+        wall = time.time() - t0
+        results.append({
+            'setting': f"{fps}fps {width}x{height} {pix_fmt}",
+            'ok': ok and len(scenes.scores) == len(other.scores) == sampler.frames,
+            'frames': sampler.frames,
+            'fps': sampler.frames / wall if wall else 0.0,
+            'realtime': seconds / wall if wall else 0.0,
+            'ring_kb': sampler.ring.nbytes / 1024,
+            'peak_rss_mb': peak_rss_mb(),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+    from modules.processor import VideoProcessor
+
+    print(f"{'Setting':<24} | {'Frames':>6} | {'Frames/s':>8} | {'x Realtime':>10} | {'Ring KB':>7} | {'Peak RSS MB':>11}")
+    print("-" * 82)
+    for r in benchmark(VideoProcessor()):
+        flag = "" if r['ok'] else "  (decode failed)"
+        print(f"{r['setting']:<24} | {r['frames']:>6} | {r['fps']:>8.0f} | {r['realtime']:>10.1f} | "
+              f"{r['ring_kb']:>7.0f} | {r['peak_rss_mb']:>11.1f}{flag}")
@@ -0,0 +1,168 @@
+"""
+Smart crop - a smoothed 9:16 crop window that follows the action.
+
+One FrameSampler decode (non-reference frames skipped, a few small gray
+frames per second) feeds a CropTracker, which scores every column of every
+frame by motion (difference to the previous frame) and saliency (edge
+energy). The best window per frame comes from a cumulative sum over the
+columns, the path is median-filtered and smoothed within each shot (a hard
+cut may jump, a shot never jitters), then simplified to a few keypoints.
+The processor turns the keypoints into a time-varying crop x expression in
+the same encode that scales and speeds up the part.
+"""
+
+from modules.sampler import FrameSampler, FrameConsumer
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+TRACK_FPS = 4           # Samples per second
+TRACK_W = 160           # Sample width (height follows the source aspect)
+MOTION_WEIGHT = 0.6     # Share of motion vs. saliency in a column's score
+CENTER_BIAS = 0.15      # Pull toward the middle when nothing stands out
+SHOT_CUT = 0.12         # Mean frame difference of a hard cut (same scale as analysis.SCENE_CUT)
+MEDIAN_SECONDS = 2.0    # Outlier rejection window
+SMOOTH_SECONDS = 1.5    # Box smoothing window (applied twice, ~triangular)
+KEYPOINT_TOLERANCE = 0.01   # Max simplification error, as a fraction of the source width
+CACHE_KIND = f"smartcrop:{TRACK_FPS}fps:{TRACK_W}:{MOTION_WEIGHT}:{CENTER_BIAS}:{SMOOTH_SECONDS}"
+
+
+class CropTracker(FrameConsumer):
+    """Per-frame column scores and shot changes for one decode."""
+    def start(self, sampler):
+        self.columns = []
+        self.cuts = []
+        self.prev = None
+        self._work = np.empty((sampler.batch + 1,) + sampler.frame_shape, dtype=np.float32)
+
+    def feed(self, frames, times):
+        n = len(frames)
+        work = self._work[:n + 1]
+        np.copyto(work[1:], frames, casting='unsafe')
+        work[0] = work[1] if self.prev is None else self.prev
+        cur = work[1:]
+
+        motion = np.abs(cur - work[:-1])
+        self.cuts.append(motion.mean(axis=(1, 2)) / 255.0)
+        # Edge energy: horizontal and vertical gradients, per column
+        edges = np.zeros_like(cur)
+        edges[:, :, 1:] = np.abs(np.diff(cur, axis=2))
+        edges[:, 1:, :] += np.abs(np.diff(cur, axis=1))
+
+        motion = motion.sum(axis=1)
+        edges = edges.sum(axis=1)
+        # Normalise each frame's profiles so neither term dominates by scale
+        motion /= motion.mean(axis=1, keepdims=True) + 1e-6
+        edges /= edges.mean(axis=1, keepdims=True) + 1e-6
+        self.columns.append(MOTION_WEIGHT * motion + (1 - MOTION_WEIGHT) * edges)
+        self.prev = frames[-1]
+
+
+def _box(values, width):
+    """Moving average along axis 0 (edge-padded, same length)."""
+    if width < 2 or len(values) < 2:
+        return values
+    pad = width // 2
+    padded = np.concatenate([np.repeat(values[:1], pad, axis=0), values, np.repeat(values[-1:], width - pad - 1, axis=0)])
+    cs = np.cumsum(padded, axis=0, dtype=np.float64)
+    cs = np.concatenate([np.zeros((1,) + values.shape[1:]), cs])
+    return ((cs[width:] - cs[:-width]) / width).astype(values.dtype)
+
+
+def _median(values, width):
+    if width < 2 or len(values) < width:
+        return values
+    pad = width // 2
+    padded = np.concatenate([np.repeat(values[:1], pad), values, np.repeat(values[-1:], width - pad - 1)])
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, width), axis=1)
+
+
+def track_path(columns, cuts, window):
+    """Left edge of the best window (in sample columns) per frame, smoothed within shots."""
+    step_frames = lambda seconds: max(1, int(round(seconds * TRACK_FPS)))
+    # Scores steadier than a single frame: average over ~half a second first
+    scores = _box(columns, step_frames(0.5))
+    width = scores.shape[1]
+    cs = np.concatenate([np.zeros((len(scores), 1), dtype=np.float32), np.cumsum(scores, axis=1)], axis=1)
+    sums = cs[:, window:] - cs[:, :-window]
+    lefts = np.arange(sums.shape[1], dtype=np.float32)
+    middle = (width - window) / 2
+    # A window score is its share of the frame's energy, minus a pull to the middle
+    sums = sums / (cs[:, -1:] + 1e-6) - CENTER_BIAS * np.abs(lefts - middle) / max(middle, 1.0)
+    best = np.argmax(sums, axis=1).astype(np.float32)
+
+    path = np.empty_like(best)
+    bounds = [0] + [int(i) for i in np.flatnonzero(cuts > SHOT_CUT) if i > 0] + [len(best)]
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        shot = _median(best[a:b], step_frames(MEDIAN_SECONDS))
+        shot = _box(_box(shot, step_frames(SMOOTH_SECONDS)), step_frames(SMOOTH_SECONDS))
+        path[a:b] = shot
+    return np.clip(path, 0, width - window)
+
+
+def simplify(times, values, tolerance):
+    """Ramer-Douglas-Peucker on a sampled curve. Returns the indices kept."""
+    keep = np.zeros(len(values), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(values) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        t = times[a + 1:b]
+        line = values[a] + (values[b] - values[a]) * (t - times[a]) / (times[b] - times[a])
+        err = np.abs(values[a + 1:b] - line)
+        i = int(np.argmax(err))
+        if err[i] > tolerance:
+            split = a + 1 + i
+            keep[split] = True
+            stack.extend([(a, split), (split, b)])
+    return np.flatnonzero(keep)
+
+
+class SmartCropper:
+    def __init__(self, processor):
+        # Borrow the processor's FFmpeg, cache and cancellable process tracking
+        self.processor = processor
+
+    def track(self, path, duration, width, height, progress_callback=None):
+        """Crop track for a 9:16 window on path, from the cache when possible.
+
+        Returns {'step', 'left'} with the window's left edge per step as a
+        fraction of the source width, or None when the source is already
+        9:16 or narrower, or analysis isn't possible.
+        """
+        if not NUMPY_AVAILABLE or not width or not height or width * 16 <= height * 9:
+            return None
+        cached = self.processor.cache.get_analysis(path, CACHE_KIND)
+        if cached:
+            return cached
+
+        sample_h = max(2, int(round(TRACK_W * height / width / 2)) * 2)
+        sampler = FrameSampler(self.processor, TRACK_FPS, TRACK_W, sample_h, 'gray', skip_nonref=True)
+        tracker = CropTracker()
+        ok = sampler.run(path, [tracker], duration=duration, progress_callback=progress_callback)
+        if not ok or not tracker.columns:
+            return None
+
+        window = max(1, int(round(sample_h * 9 / 16)))
+        path_cols = track_path(np.concatenate(tracker.columns), np.concatenate(tracker.cuts), window)
+        data = {
+            'step': 1.0 / TRACK_FPS,
+            'left': [round(float(v) / TRACK_W, 4) for v in path_cols],
+        }
+        self.processor.cache.put_analysis(path, CACHE_KIND, data)
+        return data
+
+
+def crop_keypoints(track, src_width, src_height):
+    """Pixel crop plan for a source: {'width', 'points': [(source seconds, left x)]}."""
+    crop_w = int(src_height * 9 / 16) // 2 * 2
+    left = np.asarray(track['left'], dtype=np.float64) * src_width
+    left = np.clip(left, 0, src_width - crop_w)
+    times = np.arange(len(left)) * track['step']
+    keep = simplify(times, left, KEYPOINT_TOLERANCE * src_width)
+    return {'width': crop_w, 'points': [(round(float(times[i]), 2), int(left[i])) for i in keep]}
@@ -0,0 +1,266 @@
+"""
+Process supervisor - every child the engine starts goes through here.
+
+Children (FFmpeg, ffprobe, the streaming yt-dlp) run at a lower CPU and I/O
+priority, optionally on a subset of cores and under a memory cap, so a
+full-tilt libx264 encode can't starve the Qt UI or the uploader's browser.
+Limits are inherited, so anything those children start is covered too.
+
+Every child is tracked until it is reaped. stop() terminates, waits a short
+grace period, then kills; it runs on cancel and at interpreter exit. It
+reaches the whole tree: on POSIX each child leads its own process group,
+on Windows each owner's children share a kill-on-close Job Object, so
+they also die with the app when it is killed or crashes.
+"""
+
+import os
+import sys
+import time
+import atexit
+import shutil
+import signal
+import threading
+import subprocess
+
+if os.name == 'nt':
+    import ctypes
+    from ctypes import wintypes
+
+    class _IoCounters(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+    class _BasicLimits(ctypes.Structure):
+        _fields_ = [
+            ('PerProcessUserTimeLimit', ctypes.c_int64),
+            ('PerJobUserTimeLimit', ctypes.c_int64),
+            ('LimitFlags', wintypes.DWORD),
+            ('MinimumWorkingSetSize', ctypes.c_size_t),
+            ('MaximumWorkingSetSize', ctypes.c_size_t),
+            ('ActiveProcessLimit', wintypes.DWORD),
+            ('Affinity', ctypes.c_size_t),
+            ('PriorityClass', wintypes.DWORD),
+            ('SchedulingClass', wintypes.DWORD),
+        ]
+
+    class _ExtendedLimits(ctypes.Structure):
+        _fields_ = [
+            ('BasicLimitInformation', _BasicLimits),
+            ('IoInfo', _IoCounters),
+            ('ProcessMemoryLimit', ctypes.c_size_t),
+            ('JobMemoryLimit', ctypes.c_size_t),
+            ('PeakProcessMemoryUsed', ctypes.c_size_t),
+            ('PeakJobMemoryUsed', ctypes.c_size_t),
+        ]
+
+    _JOB_EXTENDED_LIMIT_INFORMATION = 9
+    _JOB_LIMIT_AFFINITY = 0x10
+    _JOB_LIMIT_PROCESS_MEMORY = 0x100
+    _JOB_LIMIT_KILL_ON_JOB_CLOSE = 0x2000
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    _kernel32.CreateJobObjectW.argtypes = [ctypes.c_void_p, wintypes.LPCWSTR]
+    _kernel32.SetInformationJobObject.restype = wintypes.BOOL
+    _kernel32.SetInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD]
+    _kernel32.AssignProcessToJobObject.restype = wintypes.BOOL
+    _kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+    _kernel32.TerminateJobObject.restype = wintypes.BOOL
+    _kernel32.TerminateJobObject.argtypes = [wintypes.HANDLE, wintypes.UINT]
+    _kernel32.CloseHandle.restype = wintypes.BOOL
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    def _check(ok):
+        if not ok:
+            raise ctypes.WinError(ctypes.get_last_error())
+        return ok
+else:
+    import resource
+
+# nice value, ionice (class, level) and Windows priority class per level
+PRIORITIES = {
+    'normal': (0, None, 0x20),          # NORMAL_PRIORITY_CLASS
+    'below_normal': (10, (2, 7), 0x4000),  # BELOW_NORMAL_PRIORITY_CLASS, best-effort lowest
+    'idle': (19, (3, None), 0x40),      # IDLE_PRIORITY_CLASS, idle I/O
+}
+
+# Seconds a child gets to exit after terminate() before it is killed
+STOP_GRACE = 3.0
+
+
+class ProcessSupervisor:
+    def __init__(self, priority='below_normal', free_cores=0, memory_mb=None):
+        self._procs = {}
+        self._lock = threading.Lock()
+        self._jobs = {}     # owner -> its Job Object (Windows)
+        self.configure(priority, free_cores, memory_mb)
+
+    def configure(self, priority='below_normal', free_cores=0, memory_mb=None):
+        """Set the limits for children started from now on.
+
+        free_cores keeps that many cores (the first ones) for the UI and
+        browser; memory_mb caps each child's address space (None = no cap).
+        """
+        if priority not in PRIORITIES:
+            priority = 'below_normal'
+        self.priority = priority
+        cores = self._all_cores()
+        free_cores = min(max(int(free_cores or 0), 0), len(cores) - 1)
+        self.affinity = cores[free_cores:] if free_cores else None
+        self.memory_mb = memory_mb or None
+
+    def _all_cores(self):
+        if hasattr(os, 'sched_getaffinity'):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    def cpu_count(self):
+        """Cores a supervised child may use (for sizing encoder threads)."""
+        return len(self.affinity) if self.affinity else len(self._all_cores())
+
+    def spawn(self, cmd, owner=None, **kwargs):
+        """Start a hidden, limited child and track it under owner until release()."""
+        nice, ionice, priority_class = PRIORITIES[self.priority]
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            kwargs.setdefault('startupinfo', startupinfo)
+            kwargs['creationflags'] = kwargs.get('creationflags', 0) | priority_class
+        else:
+            # Its own process group, so stop() reaches everything it starts
+            kwargs['start_new_session'] = True
+            kwargs['preexec_fn'] = self._preexec(nice)
+            if ionice and sys.platform.startswith('linux') and shutil.which('ionice'):
+                # ionice execs the command, so the pid (and everything below) is the child's
+                level = ["-n", str(ionice[1])] if ionice[0] == 2 else []
+                cmd = ["ionice", "-c", str(ionice[0])] + level + list(cmd)
+        kwargs.setdefault('stdin', subprocess.DEVNULL)
+
+        process = subprocess.Popen(cmd, **kwargs)
+        job = None
+        if os.name == 'nt':
+            try:
+                job = self._assign_job(process, owner)
+            except Exception as e:
+                # Limits are best effort; a child at normal priority is still a working child
+                print(f"Supervisor Error: {e}")
+        with self._lock:
+            self._procs[process] = (owner, job)
+        return process
+
+    def _preexec(self, nice):
+        """Limits applied in the child before exec, so they hold for every thread it ever starts."""
+        affinity = self.affinity
+        memory = self.memory_mb * 1024 * 1024 if self.memory_mb else None
+
+        def limit():
+            # Best effort, like the Windows job: a failed limit must not fail the spawn
+            try:
+                if nice:
+                    os.setpriority(os.PRIO_PROCESS, 0, nice)
+                if affinity and hasattr(os, 'sched_setaffinity'):
+                    os.sched_setaffinity(0, affinity)
+                if memory:
+                    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            except (OSError, ValueError):
+                pass
+        return limit
+
+    def _assign_job(self, process, owner):
+        """Put process in owner's Job Object (created with the current limits). Returns the job."""
+        with self._lock:
+            job = self._jobs.get(owner)
+            if job is None:
+                job = _check(_kernel32.CreateJobObjectW(None, None))
+                info = _ExtendedLimits()
+                flags = _JOB_LIMIT_KILL_ON_JOB_CLOSE
+                if self.affinity:
+                    flags |= _JOB_LIMIT_AFFINITY
+                    info.BasicLimitInformation.Affinity = sum(1 << c for c in self.affinity)
+                if self.memory_mb:
+                    flags |= _JOB_LIMIT_PROCESS_MEMORY
+                    info.ProcessMemoryLimit = self.memory_mb * 1024 * 1024
+                info.BasicLimitInformation.LimitFlags = flags
+                try:
+                    _check(_kernel32.SetInformationJobObject(job, _JOB_EXTENDED_LIMIT_INFORMATION,
+                                                             ctypes.byref(info), ctypes.sizeof(info)))
+                except OSError:
+                    _kernel32.CloseHandle(job)
+                    raise
+                # Closed once the owner has no children left, or by the OS when this
+                # process ends for whatever reason; either way that kills the job
+                self._jobs[owner] = job
+        _check(_kernel32.AssignProcessToJobObject(job, int(process._handle)))
+        return job
+
+    def release(self, process):
+        """Stop tracking a child that has been waited on."""
+        with self._lock:
+            _, job = self._procs.pop(process, (None, None))
+            if job is None or any(j == job for _, j in self._procs.values()):
+                return
+            # Last child of this job: close it (taking any orphaned grandchildren with it)
+            for owner, j in list(self._jobs.items()):
+                if j == job:
+                    del self._jobs[owner]
+        _kernel32.CloseHandle(job)
+
+    def run(self, cmd, owner=None, **kwargs):
+        """subprocess.run() for supervised children: returns (returncode, stdout, stderr)."""
+        process = self.spawn(cmd, owner, **kwargs)
+        try:
+            out, err = process.communicate()
+        finally:
+            self.release(process)
+        return process.returncode, out, err
+
+    def _signal(self, process, job, kill):
+        """Terminate (or kill) a child and everything it started."""
+        try:
+            if os.name == 'nt':
+                # Every process in the job, grandchildren included
+                if job is not None:
+                    _kernel32.TerminateJobObject(job, 1)
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+        except Exception:
+            pass
+
+    def stop(self, owner=None, wait=True):
+        """Terminate owner's children (all with owner=None) and their children, killing any that linger.
+
+        With wait=False the grace period runs on a side thread so a UI
+        thread never blocks; the children are still reaped.
+        """
+        with self._lock:
+            procs = [(p, job) for p, (o, job) in self._procs.items() if owner is None or o is owner]
+        if not procs:
+            return
+        for process, job in procs:
+            self._signal(process, job, kill=False)
+        if wait:
+            self._reap(procs)
+        else:
+            threading.Thread(target=self._reap, args=(procs,), daemon=True).start()
+
+    def _reap(self, procs):
+        deadline = time.time() + STOP_GRACE
+        for process, job in procs:
+            try:
+                process.wait(timeout=max(deadline - time.time(), 0.1))
+            except subprocess.TimeoutExpired:
+                self._signal(process, job, kill=True)
+                process.wait()
+            except Exception:
+                pass
+            if os.name != 'nt':
+                # Grandchildren that outlived the grace period (or ignored SIGTERM)
+                self._signal(process, job, kill=True)
+            self.release(process)
+
+
+SUPERVISOR = ProcessSupervisor()
+# Nothing the engine started outlives the interpreter
+atexit.register(SUPERVISOR.stop)